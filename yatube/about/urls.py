@@ -1,10 +1,13 @@
 from django.urls import path
 
+from core.cache import versioned_page
 from . import views
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path('author/', versioned_page('about')(views.AboutAuthorView.as_view()),
+         name='author'),
+    path('tech/', versioned_page('about')(views.AboutTechView.as_view()),
+         name='tech'),
 ]
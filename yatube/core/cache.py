@@ -0,0 +1,151 @@
+import time
+from datetime import datetime
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+# Версия области — время её последнего изменения. Страницы кэшируются под
+# ключом, в который входят версии их областей, так что сигналу достаточно
+# обновить версию, чтобы старые копии перестали находиться.
+VERSION_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def version_key(scope):
+    return f'page-version:{scope}'
+
+
+def get_versions(scopes):
+    """Версии областей. У неизвестной области (None) версия новая при
+    каждом вызове: страница с ней не находится в кэше и не отдаёт 304."""
+    keys = [version_key(scope) for scope in scopes if scope is not None]
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, VERSION_TIMEOUT)
+        versions.update(missing)
+    return [
+        versions[version_key(scope)] if scope is not None else time.time()
+        for scope in scopes
+    ]
+
+
+def resolve_scopes(scopes, kwargs):
+    """Имена областей страницы: шаблоны вроде 'group:{slug}' заполняются
+    из kwargs вью, а функция получает kwargs и возвращает список имён,
+    в котором None — область, которую сейчас не узнать."""
+    names = []
+    for scope in scopes:
+        if callable(scope):
+            names.extend(scope(**kwargs))
+        else:
+            names.append(scope.format(**kwargs))
+    return names
+
+
+def bump(*scopes):
+    now = time.time()
+    cache.set_many(
+        {version_key(scope): now for scope in scopes}, VERSION_TIMEOUT
+    )
+
+
+def is_anonymous(request):
+    """Запрос без сессии: проверка не обращается к базе."""
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def anonymous_cache_page(*scopes):
+    """Кэширует страницу для анонимных посетителей по адресу с query string.
+
+    scopes — шаблоны областей, которые подставляются из kwargs вью,
+    например 'group:{slug}', или функции (см. resolve_scopes). Кэш
+    выключен, пока PAGE_CACHE_TIMEOUT равен 0.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            if (not timeout or request.method != 'GET'
+                    or not is_anonymous(request)):
+                return view(request, *args, **kwargs)
+
+            def page_key():
+                names = resolve_scopes(scopes, kwargs)
+                versions = get_versions(names)
+                path = request.get_full_path()
+                key = 'page:' + md5(
+                    f'{path}:{versions}'.encode()).hexdigest()
+                return key, None in names
+
+            key, unknown = page_key()
+            response = cache.get(key)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+
+            def store(response):
+                if (response.status_code != 200
+                        or request.META.get('CSRF_COOKIE_USED')):
+                    return
+                # Вью могла запомнить неизвестную раньше область.
+                cache.set(page_key()[0] if unknown else key, response,
+                          timeout)
+
+            if callable(getattr(response, 'render', None)):
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+        return wrapper
+    return decorator
+
+
+def request_versions(request, scopes, kwargs):
+    """Версии областей страницы, а для пользователя — и его личной
+    области, которую меняют его подписки."""
+    if not hasattr(request, 'page_versions'):
+        scopes = resolve_scopes(scopes, kwargs)
+        if not is_anonymous(request) and request.user.is_authenticated:
+            scopes.append(f'user:{request.user.pk}')
+        request.page_versions = get_versions(scopes)
+    return request.page_versions
+
+
+def conditional_page(*scopes):
+    """Отдаёт 304 по ETag и Last-Modified, посчитанным из версий областей,
+    не выполняя вью."""
+    def etag(request, *args, **kwargs):
+        versions = request_versions(request, scopes, kwargs)
+        user = request.user.pk if not is_anonymous(request) else None
+        csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        return md5(
+            f'{request.get_full_path()}:{versions}:{user}:{csrf}'.encode()
+        ).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if not is_anonymous(request):
+            return None
+        versions = request_versions(request, scopes, kwargs)
+        return datetime.fromtimestamp(max(versions), tz=timezone.utc)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return condition(etag, last_modified)(wrapper)
+    return decorator
+
+
+def versioned_page(*scopes):
+    """Условный GET и кэш для анонимных посетителей по одним областям."""
+    def decorator(view):
+        return conditional_page(*scopes)(anonymous_cache_page(*scopes)(view))
+    return decorator
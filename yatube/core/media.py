@@ -0,0 +1,158 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from core.queries import query_budget
+from core.static import file_etag
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Файлы, названные хешем содержимого или параметров (картинки постов
+# и миниатюры sorl), под тем же именем не меняются.
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{32,}\.\w+$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_MAX_AGE = 60 * 60 * 24
+
+OFFLOAD_HEADERS = {
+    'x-accel-redirect': 'X-Accel-Redirect',
+    'x-sendfile': 'X-Sendfile',
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    """Часть открытого файла длиной length с позиции start.
+
+    fileno() отдаёт дескриптор исходного файла, так что сервер WSGI может
+    передать часть через sendfile со смещением и длиной из Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Первый и последний байт из заголовка Range с одним диапазоном.
+
+    None — заголовок не распознан и отдаётся весь файл, как разрешает
+    RFC 7233; для нескольких диапазонов тоже отдаётся весь файл.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        if not int(end):
+            raise RangeNotSatisfiable
+        return max(size - int(end), 0), size - 1
+    start, end = int(start), int(end) if end else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def cache_control(name):
+    if HASHED_NAME.search(name):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={MEDIA_MAX_AGE}'
+
+
+def offload(name, path):
+    """Ответ, передающий отдачу файла nginx (X-Accel-Redirect на
+    внутренний location MEDIA_ACCEL_PREFIX) или Apache (X-Sendfile)."""
+    header = OFFLOAD_HEADERS[settings.MEDIA_OFFLOAD]
+    response = HttpResponse()
+    if header == 'X-Sendfile':
+        response[header] = path
+    else:
+        response[header] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+    return response
+
+
+def file_response(request, path, size, etag, last_modified):
+    """FileResponse с файлом целиком или с частью из заголовка Range."""
+    content_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    header = request.META.get('HTTP_RANGE')
+    if header and if_range in (None, etag, http_date(last_modified)):
+        try:
+            content_range = parse_range(header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    file = open(path, 'rb')
+    if content_range is None:
+        return FileResponse(file)
+    start, end = content_range
+    response = FileResponse(FileRange(file, start, end - start + 1),
+                            status=206)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = end - start + 1
+    return response
+
+
+@require_safe
+@query_budget(0)
+def serve(request, name):
+    """Отдаёт файл из MEDIA_ROOT без чтения в память.
+
+    Поддерживает запросы части файла (Range, If-Range) и условные запросы
+    по ETag и Last-Modified. Файл передаётся через wsgi.file_wrapper,
+    а при MEDIA_OFFLOAD — фронтовому серверу, и воркер Python не занят
+    его отправкой.
+    """
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if settings.MEDIA_OFFLOAD:
+            response = offload(name, path)
+        else:
+            response = file_response(
+                request, path, stat.st_size, etag, last_modified)
+        if response.status_code == 416:
+            return response
+        content_type = mimetypes.guess_type(name)[0]
+        response['Content-Type'] = content_type or 'application/octet-stream'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control(name)
+    return response
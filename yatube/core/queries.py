@@ -0,0 +1,193 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, NotSupportedError, connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('core.queries.slow')
+
+# Запрос одной формы, выполненный за обработку запроса больше этого числа
+# раз, считается признаком N+1.
+DUPLICATE_QUERY_LIMIT = 3
+
+PLACEHOLDERS = re.compile(r'%s(, %s)+')
+
+state = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Объявляет наибольшее число SQL-запросов, которое может выполнить
+    вью за обработку одного запроса."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+@contextmanager
+def unbudgeted():
+    """Запросы внутри блока не входят в бюджет вью: так на месте
+    выполняется работа, которая обычно идёт вне запроса."""
+    previous = getattr(state, 'unbudgeted', False)
+    state.unbudgeted = True
+    try:
+        yield
+    finally:
+        state.unbudgeted = previous
+
+
+class QueryCounter:
+    """Обёртка execute, считающая запросы и их формы."""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not getattr(state, 'unbudgeted', False):
+            self.count += 1
+            self.shapes[PLACEHOLDERS.sub('%s', sql)] += 1
+        return execute(sql, params, many, context)
+
+    def duplicates(self):
+        return [
+            shape for shape, count in self.shapes.items()
+            if count > DUPLICATE_QUERY_LIMIT
+        ]
+
+
+class QueryBudgetMiddleware:
+    """Проверяет число запросов к базе и повторы одной формы запроса.
+
+    Нарушения пишутся в лог, а при QUERY_BUDGET_STRICT — поднимают
+    QueryBudgetExceeded, чтобы тесты падали на регрессиях.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+        self.check(request, counter)
+        return response
+
+    def check(self, request, counter):
+        match = request.resolver_match
+        if match is None:
+            return
+        problems = []
+        budget = getattr(match.func, 'query_budget', None)
+        if budget is not None and counter.count > budget:
+            problems.append(
+                f'{counter.count} запросов при бюджете {budget}')
+        for shape in counter.duplicates():
+            problems.append(
+                f'N+1: {counter.shapes[shape]} раз выполнен запрос {shape}')
+        if not problems:
+            return
+        message = f'{match.view_name} ({request.path}): ' + '; '.join(
+            problems)
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def redact(plan, params):
+    """Строки плана без строковых параметров запроса: Postgres подставляет
+    значения в условия плана, а среди них бывают ключи сессий и хеши
+    паролей."""
+    values = sorted({param for param in params or ()
+                     if isinstance(param, str) and param},
+                    key=len, reverse=True)
+    for value in values:
+        plan = [line.replace(value, '%s') for line in plan]
+    return plan
+
+
+class SlowQueryLog:
+    """Обёртка execute, пишущая запросы дольше порога строкой JSON
+    вместе с планом запроса. Параметры запроса в лог не попадают."""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            if duration >= self.threshold:
+                self.log(sql, params, many, context, duration)
+
+    def explain(self, sql, params, context):
+        # Курсор бэкенда минует обёртки execute, так что план не попадает
+        # ни в этот лог, ни в бюджет запросов вью.
+        db = context['connection']
+        cursor = db.create_cursor()
+        try:
+            cursor.execute(f'{db.ops.explain_query_prefix()} {sql}', params)
+            return redact(
+                [' '.join(map(str, row)) for row in cursor.fetchall()],
+                params)
+        except (DatabaseError, NotSupportedError):
+            return None
+        finally:
+            cursor.close()
+
+    def log(self, sql, params, many, context, duration):
+        match = self.request.resolver_match
+        plan = None
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            plan = self.explain(sql, params, context)
+        slow_logger.warning(json.dumps({
+            'time': timezone.now().isoformat(),
+            'request_id': self.request.request_id,
+            'view': match.view_name if match else None,
+            'path': self.request.path,
+            'duration_ms': round(duration, 3),
+            'sql': sql,
+            'plan': plan,
+        }, ensure_ascii=False, default=str))
+
+
+class SlowQueryMiddleware:
+    """Пишет медленные запросы доли SLOW_QUERY_SAMPLE_RATE запросов
+    к сайту в лог core.queries.slow.
+
+    Идентификатор берётся из заголовка X-Request-ID или создаётся
+    и возвращается в ответе.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.request_id = (request.META.get('HTTP_X_REQUEST_ID')
+                              or uuid.uuid4().hex)
+        if random.random() < settings.SLOW_QUERY_SAMPLE_RATE:
+            log = SlowQueryLog(request, settings.SLOW_QUERY_THRESHOLD_MS)
+            with connection.execute_wrapper(log):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        response['X-Request-ID'] = request.request_id
+        return response
@@ -0,0 +1,159 @@
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage)
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Сжатые копии создаются только для текстовых форматов: картинки и шрифты
+# уже сжаты, и gzip их не уменьшит.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ico', '.json', '.map', '.txt',
+                '.xml', '.html')
+# Копия сохраняется, только если она меньше оригинала хотя бы на 5%.
+MIN_RATIO = 0.95
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# Файлы без хеша в имени (favicon.ico, который браузеры запрашивают сами)
+# могут измениться при следующем деплое.
+STATIC_MAX_AGE = 60 * 60
+
+
+def compressors():
+    """Кодировки сжатых копий от более к менее предпочтительной."""
+    if brotli is not None:
+        yield 'br', '.br', lambda data: brotli.compress(data, quality=11)
+    yield 'gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем содержимого в именах и сжатыми копиями.
+
+    collectstatic сохраняет рядом с каждым текстовым файлом .gz и, если
+    установлен пакет brotli, .br. Пока статика не собрана (тесты, разработка),
+    {% static %} отдаёт имена без хеша.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths).union(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE):
+                yield from self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as original:
+            data = original.read()
+        for _, suffix, compress in compressors():
+            compressed = compress(data)
+            if len(compressed) > len(data) * MIN_RATIO:
+                continue
+            self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+            yield name, name + suffix, True
+
+
+def file_etag(stat):
+    """ETag по времени изменения и размеру файла: не требует чтения."""
+    return quote_etag(f'{int(stat.st_mtime):x}-{stat.st_size:x}')
+
+
+def accepted_encodings(header):
+    encodings = set()
+    for item in header.split(','):
+        encoding, _, params = item.partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную статику из STATIC_ROOT, не доходя до вью.
+
+    Браузеру, принимающему сжатие, отдаётся готовая .br или .gz копия.
+    Файлы с хешем из манифеста кэшируются навсегда (immutable), остальные —
+    на STATIC_MAX_AGE. Ответ — FileResponse с открытым файлом, так что
+    сервер WSGI передаёт его через wsgi.file_wrapper (sendfile), не копируя
+    в Python. При DEBUG статику отдаёт runserver.
+    """
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.root = settings.STATIC_ROOT
+        self.immutable = set(
+            getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if (request.method in ('GET', 'HEAD')
+                and request.path_info.startswith(self.prefix)):
+            response = self.serve(
+                request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        encoding, path = self.choose_variant(request, name, path)
+        stat = os.stat(path)
+        etag = file_etag(stat)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = FileResponse(open(path, 'rb'))
+            # FileResponse определяет тип по имени и для .gz отдал бы
+            # application/gzip.
+            content_type = mimetypes.guess_type(name)[0]
+            response['Content-Type'] = (
+                content_type or 'application/octet-stream')
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if name in self.immutable:
+            response['Cache-Control'] = (
+                f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+        else:
+            response['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}'
+        if name.endswith(COMPRESSIBLE):
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def choose_variant(self, request, name, path):
+        """Кодировка и путь сжатой копии, которую принимает браузер,
+        или (None, path) для оригинала."""
+        if name.endswith(COMPRESSIBLE):
+            accepted = accepted_encodings(
+                request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            for encoding, suffix, _ in compressors():
+                if encoding in accepted and os.path.isfile(path + suffix):
+                    return encoding, path + suffix
+        return None, path
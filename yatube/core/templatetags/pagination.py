@@ -0,0 +1,29 @@
+from django import template
+
+register = template.Library()
+
+ON_EACH_SIDE = 3
+ON_ENDS = 1
+
+
+@register.filter
+def elided_page_range(page):
+    """Номера страниц вокруг текущей и по краям; пропуски отмечены None."""
+    num_pages = page.paginator.num_pages
+    numbers = {
+        *range(1, ON_ENDS + 1),
+        *range(page.number - ON_EACH_SIDE, page.number + ON_EACH_SIDE + 1),
+        *range(num_pages - ON_ENDS + 1, num_pages + 1),
+    }
+    page_range = []
+    previous = 0
+    for number in sorted(numbers):
+        if not 1 <= number <= num_pages:
+            continue
+        if number - previous == 2:
+            page_range.append(previous + 1)
+        elif number - previous > 2:
+            page_range.append(None)
+        page_range.append(number)
+        previous = number
+    return page_range
@@ -2,9 +2,30 @@ from django.contrib import admin
 
 from .models import Group
 from .models import Post, Comment, Follow
+from .paginator import CachedCountPaginator
+from .search import matching_ids
 
 
-class PostAdmin(admin.ModelAdmin):
+class FastChangeListMixin:
+    """Список без полного COUNT(*) на каждый запрос: размер берётся из
+    кэша, а общее число строк без фильтров не считается. Даты фильтруются
+    через list_filter: date_hierarchy перебирал бы DISTINCT даты всей
+    таблицы."""
+
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = (
+        'title',
+        'slug',
+    )
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class PostAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,31 +33,54 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
+    list_select_related = ('author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    autocomplete_fields = ('author',)
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Готовый список выбора копируется в форму каждой строки
+            # list_editable, и группы не запрашиваются заново для каждой.
+            if not hasattr(request, 'group_choices'):
+                request.group_choices = [
+                    choice for choice in formfield.choices]
+            formfield.choices = request.group_choices
+        return formfield
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = (
         'post',
         'author',
         'text',
         'created',
     )
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
     list_filter = ('created',)
+    autocomplete_fields = ('post', 'author')
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = (
         'author',
         'user',
     )
+    list_select_related = ('author', 'user')
+    autocomplete_fields = ('author', 'user')
 
 
 admin.site.register(Follow, FollowAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
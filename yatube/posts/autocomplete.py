@@ -0,0 +1,245 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict, namedtuple
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from .models import Group, User
+
+# Изменения индекса пишутся в журнал в кэше: счётчик CHANGES_KEY — номер
+# последнего изменения, запись change_key(номер) — (ключ, новая запись).
+CHANGES_KEY = 'autocomplete-changes'
+CHANGE_TIMEOUT = 60 * 60 * 24
+# Процесс, отставший больше чем на MAX_CHANGES изменений, перестраивает
+# индекс целиком, а не применяет их по одному.
+MAX_CHANGES = 1000
+LIMIT = 10
+MAX_QUERY_LENGTH = 100
+# Нечёткий поиск по триграммам включается для запросов от этой длины,
+# пока подсказок по префиксу меньше LIMIT.
+FUZZY_MIN_LENGTH = 3
+FUZZY_MIN_SIMILARITY = 0.3
+
+Entry = namedtuple('Entry', 'key kind label url terms')
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е').strip().lstrip('@')
+
+
+def trigrams(term):
+    padded = f' {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def user_entry(pk, username, first_name, last_name):
+    full_name = f'{first_name} {last_name}'.strip()
+    label = f'{full_name} (@{username})' if full_name else f'@{username}'
+    terms = {normalize(username)}
+    if full_name:
+        terms.add(normalize(full_name))
+        terms.update(normalize(name) for name in full_name.split())
+    return make_entry(('user', pk), 'user', label,
+                      reverse('posts:profile', args=[username]), terms)
+
+
+def group_entry(pk, slug, title):
+    terms = {normalize(slug), normalize(title)}
+    terms.update(normalize(word) for word in title.split())
+    return make_entry(('group', pk), 'group', title,
+                      reverse('posts:group_list', args=[slug]), terms)
+
+
+def make_entry(key, kind, label, url, terms):
+    return Entry(key, kind, label, url,
+                 frozenset(term for term in terms if term))
+
+
+def change_key(number):
+    return f'autocomplete-change:{number}'
+
+
+def last_change():
+    """Номер последнего изменения. Счётчик, потерянный кэшем, начинается
+    заново со времени в миллисекундах, так что с прежними номерами
+    процессов он не совпадает и их индексы перестраиваются."""
+    cache.add(CHANGES_KEY, int(time.time() * 1000), None)
+    return cache.get(CHANGES_KEY)
+
+
+def invalidate():
+    """Пропуск в журнале: все процессы перестроят индекс при следующем
+    запросе. Нужен после правок без сигналов, например bulk_create."""
+    last_change()
+    cache.incr(CHANGES_KEY)
+
+
+class AutocompleteIndex:
+    """Подсказки по пользователям и группам из памяти процесса.
+
+    Префиксы ищутся двоичным поиском по отсортированному списку
+    (термин, ключ), опечатки — по общим триграммам. Индекс строится при
+    первом запросе, а сигналы пишут изменения в журнал в кэше, и каждый
+    процесс применяет их к своей копии точечно, без запросов к базе.
+    Целиком индекс перестраивается, только если журнал потерян или процесс
+    отстал больше чем на MAX_CHANGES изменений.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.applied = None
+        self.entries = {}
+        self.terms = []
+        self.owners = defaultdict(set)
+        self.postings = defaultdict(set)
+        self.sizes = {}
+
+    def build(self):
+        # Номер читается до базы: изменения, пришедшие во время построения,
+        # применятся ещё раз, а это безопасно.
+        applied = last_change()
+        entries = [
+            user_entry(*row) for row in User.objects.values_list(
+                'pk', 'username', 'first_name', 'last_name').iterator()
+        ] + [
+            group_entry(*row) for row in Group.objects.values_list(
+                'pk', 'slug', 'title').iterator()
+        ]
+        self.entries = {}
+        self.terms = []
+        self.owners = defaultdict(set)
+        self.postings = defaultdict(set)
+        self.sizes = {}
+        for entry in entries:
+            self._add(entry)
+        self.terms.sort()
+        self.applied = applied
+
+    def _add(self, entry, insert=list.append):
+        self.entries[entry.key] = entry
+        for term in entry.terms:
+            insert(self.terms, (term, entry.key))
+            if not self.owners[term]:
+                term_trigrams = trigrams(term)
+                self.sizes[term] = len(term_trigrams)
+                for trigram in term_trigrams:
+                    self.postings[trigram].add(term)
+            self.owners[term].add(entry.key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry.terms:
+            index = bisect_left(self.terms, (term, key))
+            if index < len(self.terms) and self.terms[index] == (term, key):
+                del self.terms[index]
+            self.owners[term].discard(key)
+            if not self.owners[term]:
+                del self.owners[term], self.sizes[term]
+                for trigram in trigrams(term):
+                    self.postings[trigram].discard(term)
+
+    def _apply(self, key, entry):
+        self._remove(key)
+        if entry is not None:
+            self._add(entry, insert=insort)
+
+    def apply_changes(self, latest):
+        """Применяет изменения журнала после self.applied; False, если
+        журнала не хватает и индекс надо перестроить."""
+        if not 0 <= latest - self.applied <= MAX_CHANGES:
+            return False
+        numbers = range(self.applied + 1, latest + 1)
+        changes = cache.get_many([change_key(number) for number in numbers])
+        for number in numbers:
+            change = changes.get(change_key(number))
+            if change is None:
+                return False
+            self._apply(*change)
+            self.applied = number
+        return True
+
+    def ensure_fresh(self):
+        latest = last_change()
+        if latest == self.applied:
+            return
+        with self.lock:
+            if self.applied is None or not self.apply_changes(latest):
+                self.build()
+
+    def update(self, key, entry=None):
+        """Заменяет или удаляет запись и пишет изменение в журнал."""
+        last_change()
+        number = cache.incr(CHANGES_KEY)
+        cache.set(change_key(number), (key, entry), CHANGE_TIMEOUT)
+        if self.applied is None:
+            return
+        with self.lock:
+            self._apply(key, entry)
+            if self.applied == number - 1:
+                self.applied = number
+
+    def search(self, query, limit=LIMIT):
+        query = normalize(query[:MAX_QUERY_LENGTH])
+        if not query:
+            return []
+        self.ensure_fresh()
+        with self.lock:
+            found = self.prefix_matches(query, limit)
+            if len(found) < limit and len(query) >= FUZZY_MIN_LENGTH:
+                found += self.fuzzy_matches(query, limit - len(found),
+                                            exclude=set(found))
+            return [self.entries[key] for key in found]
+
+    def prefix_matches(self, query, limit):
+        found = []
+        index = bisect_left(self.terms, (query,))
+        while index < len(self.terms) and len(found) < limit:
+            term, key = self.terms[index]
+            if not term.startswith(query):
+                break
+            if key not in found:
+                found.append(key)
+            index += 1
+        return found
+
+    def fuzzy_matches(self, query, limit, exclude):
+        query_trigrams = trigrams(query)
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for term in self.postings.get(trigram, ()):
+                shared[term] += 1
+        # Сходство Жаккара по триграммам; запись получает оценку лучшего
+        # из своих терминов.
+        scores = {}
+        for term, count in shared.items():
+            similarity = count / (
+                len(query_trigrams) + self.sizes[term] - count)
+            if similarity < FUZZY_MIN_SIMILARITY:
+                continue
+            for key in self.owners[term]:
+                if key not in exclude:
+                    scores[key] = max(scores.get(key, 0), similarity)
+        ranked = sorted(scores, key=lambda key: (
+            -scores[key], self.entries[key].label))
+        return ranked[:limit]
+
+
+index = AutocompleteIndex()
+
+
+def user_changed(user):
+    index.update(('user', user.pk), user_entry(
+        user.pk, user.username, user.first_name, user.last_name))
+
+
+def group_changed(group):
+    index.update(('group', group.pk),
+                 group_entry(group.pk, group.slug, group.title))
+
+
+def removed(kind, pk):
+    index.update((kind, pk))
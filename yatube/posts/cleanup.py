@@ -0,0 +1,146 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+from .storage import image_storage
+from .thumbnails import image_variants
+
+IMAGE_ROOT = Post._meta.get_field('image').upload_to.strip('/')
+THUMBNAIL_ROOT = sorl_settings.THUMBNAIL_PREFIX.strip('/')
+# Место, с которого продолжится следующий обход, хранится рядом с медиа,
+# вне обходимых каталогов.
+CURSOR_NAME = '.clean-media-cursor'
+
+BUDGET = 60
+RATE = 100
+# Свежие файлы не трогаются: картинка записывается раньше, чем пост с ней,
+# а миниатюра нового поста может появиться уже после пометки.
+GRACE = 60 * 60
+
+
+class RateLimiter:
+    """Не больше rate операций в секунду; 0 — без ограничений."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next = 0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next > now:
+            time.sleep(self.next - now)
+        self.next = max(self.next, now) + self.interval
+
+
+def live_files():
+    """Имена картинок постов и их миниатюр, которые показывает сайт."""
+    images = Post.objects.exclude(image='').order_by().values_list(
+        'image', 'image_width').distinct()
+    live = set()
+    for name, width in images.iterator():
+        live.add(name)
+        source = ImageFile(name, image_storage)
+        live.update(
+            default.backend.thumbnail_file(
+                source, variant.geometry, variant.options).name
+            for variant in image_variants(width)
+        )
+    return live
+
+
+def walk(storage, parts=(), after=()):
+    """Имена файлов хранилища в каталогах картинок и миниатюр по порядку
+    обхода, начиная с первого после after — кортежа частей имени.
+    Каталоги, целиком пройденные раньше, не читаются."""
+    if not parts:
+        dirs, files = [IMAGE_ROOT, THUMBNAIL_ROOT], []
+    elif storage.exists('/'.join(parts)):
+        dirs, files = storage.listdir('/'.join(parts))
+    else:
+        return
+    dirs = set(dirs)
+    for name in sorted(dirs.union(files)):
+        child = parts + (name,)
+        if child < after[:len(child)]:
+            continue
+        if name in dirs:
+            yield from walk(storage, child, after)
+        elif child > after:
+            yield '/'.join(child)
+
+
+def load_cursor(storage):
+    try:
+        with storage.open(CURSOR_NAME) as cursor:
+            name = cursor.read().decode()
+    except OSError:
+        return ()
+    return tuple(name.split('/')) if name else ()
+
+
+def save_cursor(storage, name):
+    storage.delete(CURSOR_NAME)
+    if name:
+        storage.save(CURSOR_NAME, ContentFile(name.encode()))
+
+
+def remove(storage, name):
+    """Удаляет файл и его записи в KVStore sorl; у картинки — вместе
+    с её миниатюрами."""
+    is_source = name.startswith(IMAGE_ROOT + '/')
+    image_file = ImageFile(
+        name, image_storage if is_source else default.storage)
+    default.kvstore.delete(image_file, delete_thumbnails=is_source)
+    storage.delete(name)
+
+
+def collect(budget=BUDGET, rate=RATE, grace=GRACE, dry_run=False,
+            storage=default_storage):
+    """Удаляет картинки, на которые не ссылается ни один пост, и миниатюры,
+    которые не нужны ни одной картинке.
+
+    Пометка живых файлов строится по базе заново при каждом запуске, а обход
+    хранилища идёт с места, где остановился прошлый: обход заканчивается
+    через budget секунд после пометки, так что долгая пометка не съедает
+    его время, и обращается к хранилищу не чаще rate раз в секунду.
+    Возвращает Counter с числом проверенных и удалённых файлов, освобождёнными
+    байтами и ключом done, если обход дошёл до конца.
+    """
+    threshold = timezone.now() - timedelta(seconds=grace)
+    live = live_files()
+    deadline = time.monotonic() + budget
+    limiter = RateLimiter(rate)
+    result = Counter()
+    cursor = load_cursor(storage)
+    last = '/'.join(cursor)
+    for name in walk(storage, after=cursor):
+        if time.monotonic() >= deadline:
+            break
+        last = name
+        result['checked'] += 1
+        if name in live:
+            continue
+        limiter.wait()
+        if storage.get_modified_time(name) > threshold:
+            continue
+        size = storage.size(name)
+        if not dry_run:
+            remove(storage, name)
+        result['removed'] += 1
+        result['freed'] += size
+    else:
+        last = ''
+        result['done'] = 1
+    if not dry_run:
+        save_cursor(storage, last)
+    return result
@@ -0,0 +1,196 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import AuthorStats, FeedItem, Follow, Post
+from .paginator import SeekPaginator, drop_indexes
+
+# Посты автора, у которого подписчиков больше FEED_PUSH_LIMIT, не
+# раскладываются по лентам при публикации: подписчики забирают их сами
+# при открытии ленты.
+FEED_PUSH_LIMIT = 1000
+FEED_BACKFILL = 200
+FEED_BATCH_SIZE = 500
+PULL_AUTHORS_TIMEOUT = 300
+PULLED_AT_TIMEOUT = 60 * 60 * 24
+TIMELINE_LENGTH = 200
+TIMELINE_TIMEOUT = 60 * 60
+
+
+def push_enabled():
+    return settings.FOLLOW_FEED_STRATEGY == 'push'
+
+
+def pull_authors():
+    """Авторы, посты которых подписчики забирают при чтении ленты."""
+    authors = cache.get('feed-pull-authors')
+    if authors is None:
+        authors = set(AuthorStats.objects.filter(
+            followers_count__gt=FEED_PUSH_LIMIT
+        ).values_list('user', flat=True))
+        cache.set('feed-pull-authors', authors, PULL_AUTHORS_TIMEOUT)
+    return authors
+
+
+def follow_key(user_id):
+    return f'follow:{user_id}'
+
+
+def add_feed_items(user_ids, posts):
+    drop_indexes([follow_key(user_id) for user_id in user_ids])
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, post_id=post.pk,
+                     author_id=post.author_id, pub_date=post.pub_date)
+            for user_id in user_ids
+            for post in posts
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def push_post(post):
+    if post.author_id in pull_authors():
+        return
+    followers = Follow.objects.filter(
+        author=post.author_id).values_list('user_id', flat=True)
+    add_feed_items(list(followers), [post])
+
+
+def backfill(follow):
+    posts = Post.objects.filter(author=follow.author_id).only(
+        'pk', 'author_id', 'pub_date')[:FEED_BACKFILL]
+    add_feed_items([follow.user_id], posts)
+
+
+def trim(follow):
+    drop_indexes([follow_key(follow.user_id)])
+    FeedItem.objects.filter(
+        user=follow.user_id, author=follow.author_id).delete()
+
+
+def post_removed(post):
+    """Сбрасывает индексы лент подписчиков, из которых вместе с постом
+    удалились его записи."""
+    followers = FeedItem.objects.filter(post=post.pk).values_list(
+        'user_id', flat=True)
+    drop_indexes([follow_key(user_id) for user_id in followers])
+
+
+def pull(user):
+    """Докладывает в ленту пользователя новые посты авторов из
+    pull_authors(), опубликованные после прошлого чтения ленты. Индекс
+    ленты сбрасывается, только если в неё действительно что-то легло."""
+    authors = pull_authors()
+    if not authors:
+        return
+    key = f'feed-pulled-at:{user.pk}'
+    pulled_at = cache.get(key)
+    started = timezone.now()
+    followed = list(Follow.objects.filter(
+        user=user, author__in=authors).values_list('author', flat=True))
+    if not followed:
+        return
+    posts = Post.objects.filter(author__in=followed).annotate(
+        in_feed=Exists(FeedItem.objects.filter(user=user, post=OuterRef('pk')))
+    ).only('pk', 'author_id', 'pub_date')
+    if pulled_at is None:
+        posts = posts[:FEED_BACKFILL]
+    else:
+        posts = posts.filter(pub_date__gte=pulled_at)
+    new_posts = [post for post in posts if not post.in_feed]
+    if new_posts:
+        add_feed_items([user.pk], new_posts)
+    cache.set(key, started, PULLED_AT_TIMEOUT)
+
+
+class FollowFeedPaginator(SeekPaginator):
+    """Листает записи ленты подписок, а на страницу отдаёт их посты."""
+
+    def _get_page(self, object_list, number, paginator):
+        posts = [item.post for item in object_list]
+        return super()._get_page(posts, number, paginator)
+
+
+def timeline_key(author_id):
+    return f'timeline:{author_id}'
+
+
+def load_timelines(author_ids):
+    """Ленты авторов, которых нет в кэше, одним запросом: ROW_NUMBER()
+    по каждому автору отсекает всё старше TIMELINE_LENGTH постов."""
+    timelines = {timeline_key(author_id): [] for author_id in author_ids}
+    if not timelines:
+        return timelines
+    ranked = Post.objects.filter(author__in=author_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('author'),
+            order_by=(F('pub_date').desc(), F('pk').desc()),
+        ),
+    ).values('pk', 'author', 'pub_date', 'position')
+    sql, params = ranked.query.sql_with_params()
+    # raw(), а не курсор: даты проходят через конвертеры поля.
+    posts = Post.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE position <= %s '
+        f'ORDER BY author_id, position',
+        (*params, TIMELINE_LENGTH))
+    for post in posts:
+        timelines[timeline_key(post.author_id)].append(
+            (post.pub_date, post.pk))
+    return timelines
+
+
+def author_timelines(author_ids):
+    """Списки (pub_date, id) последних постов авторов, от новых к старым."""
+    keys = {timeline_key(author_id): author_id for author_id in author_ids}
+    timelines = cache.get_many(keys)
+    missing = load_timelines(
+        [keys[key] for key in keys.keys() - timelines.keys()])
+    cache.set_many(missing, TIMELINE_TIMEOUT)
+    timelines.update(missing)
+    return list(timelines.values())
+
+
+class MergedTimelines:
+    """Ленивое k-путевое слияние лент авторов в одну ленту id постов."""
+
+    def __init__(self, timelines):
+        self.timelines = timelines
+
+    def __len__(self):
+        return sum(len(timeline) for timeline in self.timelines)
+
+    def __getitem__(self, page):
+        merged = heapq.merge(*self.timelines, reverse=True)
+        return [pk for _, pk in islice(merged, page.start, page.stop)]
+
+
+class TimelinePaginator(Paginator):
+    """Листает id постов из MergedTimelines и загружает страницу одним
+    запросом."""
+
+    def _get_page(self, object_list, number, paginator):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            object_list)
+        posts = [posts[pk] for pk in object_list if pk in posts]
+        return super()._get_page(posts, number, paginator)
+
+
+def follow_paginator(user, per_page):
+    if push_enabled():
+        pull(user)
+        feed = FeedItem.objects.filter(user=user).select_related(
+            'post__author', 'post__group')
+        return FollowFeedPaginator(feed, per_page, follow_key(user.pk))
+    authors = Follow.objects.filter(user=user).values_list(
+        'author', flat=True)
+    return TimelinePaginator(
+        MergedTimelines(author_timelines(authors)), per_page)
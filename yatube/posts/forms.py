@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import normalize
 from .models import Post, Comment
 
 
@@ -14,6 +16,12 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        return normalize(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,70 @@
+import logging
+import os
+from io import BytesIO
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.images import get_image_dimensions
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Большая сторона сохраняемой картинки: больше не нужно ни одной миниатюре,
+# а снимки телефонов в несколько десятков мегапикселей уменьшаются здесь
+# один раз, а не при каждой генерации миниатюр.
+MAX_SIDE = 2560
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'GIF': {'optimize': True},
+    'WEBP': {'quality': 85},
+}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def normalize(upload):
+    """Готовит загруженную картинку к хранению.
+
+    Поворачивает по EXIF, уменьшает до MAX_SIDE по большей стороне
+    и пересохраняет без метаданных. JPEG, PNG, GIF и WebP остаются в своём
+    формате, остальные сохраняются в PNG, если в них есть прозрачность,
+    иначе в JPEG. Анимированные картинки сохраняются как есть.
+    """
+    with Image.open(upload) as image:
+        if getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        format_ = image.format
+        # JPEG декодируется сразу в уменьшенном масштабе, если это
+        # позволяет размер: так быстрее и нужно меньше памяти.
+        image.draft('RGB', (MAX_SIDE, MAX_SIDE))
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+    if format_ not in SAVE_OPTIONS:
+        format_ = 'PNG' if has_alpha(image) else 'JPEG'
+    if format_ == 'JPEG':
+        image = image.convert('RGB')
+    content = BytesIO()
+    image.save(content, format_, icc_profile=icc_profile,
+               **SAVE_OPTIONS[format_])
+    name, extension = os.path.splitext(os.path.basename(upload.name))
+    if Image.registered_extensions().get(extension.lower()) != format_:
+        extension = EXTENSIONS[format_]
+    return ContentFile(content.getvalue(), name + extension)
+
+
+def dimensions(image):
+    """Ширина и высота картинки поля image по заголовку файла или
+    (None, None), если файла нет или он не читается."""
+    try:
+        # Несохранённую загрузку закрывать нельзя: её ещё запишут.
+        return get_image_dimensions(image, close=image._committed)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        logger.warning('Не удалось прочитать размер %s', image.name)
+        return None, None
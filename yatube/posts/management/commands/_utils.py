@@ -0,0 +1,53 @@
+import gzip
+import sys
+from contextlib import contextmanager
+from itertools import islice
+
+from posts.models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+# Модели выгрузки в порядке, в котором их можно загрузить: сначала те,
+# на которые ссылаются остальные.
+EXPORT_MODELS = (User, Group, Post, Comment, Follow)
+
+
+def export_fields(model):
+    return [field for field in model._meta.concrete_fields
+            if not field.primary_key]
+
+
+def open_stream(path, mode):
+    """Открывает файл выгрузки; '-' — стандартный ввод или вывод,
+    файлы с расширением .gz сжимаются."""
+    if path == '-':
+        stream = sys.stdin if 'r' in mode else sys.stdout
+        return open(stream.fileno(), mode, encoding='utf-8', closefd=False)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def batched(objects, size=BATCH_SIZE):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_dates():
+    """Позволяет задать даты публикации, изменения и комментариев вручную:
+    bulk_create иначе перезаписывает их текущим временем."""
+    fields = [Post._meta.get_field('pub_date'),
+              Post._meta.get_field('updated'),
+              Comment._meta.get_field('created')]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
@@ -0,0 +1,218 @@
+import io
+import json
+import math
+import random
+import time
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from core.queries import QueryCounter
+from posts.models import AuthorStats, Group, Post, User
+
+SCENARIOS = ('index', 'group_posts', 'profile', 'post_detail',
+             'follow_index', 'post_create', 'add_comment')
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу."""
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет основные страницы через WSGI-приложение и выводит '
+            'задержки p50/p95/p99, пропускную способность и число запросов '
+            'к базе в JSON. Кэш страниц для анонимных посетителей на время '
+            'прогона выключен, иначе замеряются попадания в него.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Число запросов на сценарий.')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Число запросов для прогрева.')
+        parser.add_argument('--scenario', action='append',
+                            choices=SCENARIOS, dest='scenarios',
+                            help='Сценарий; по умолчанию — все.')
+        parser.add_argument('--user', help='Пользователь для страниц, '
+                            'требующих входа; по умолчанию — самый '
+                            'подписанный.')
+        parser.add_argument('--host', default='localhost',
+                            help='Имя хоста из ALLOWED_HOSTS.')
+        parser.add_argument('--page-cache', action='store_true',
+                            help='Не выключать кэш страниц '
+                                 '(PAGE_CACHE_TIMEOUT).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для результатов.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.host = options['host']
+        self.app = WSGIHandler()
+        self.user = self.get_user(options['user'])
+        self.cookies = self.login(self.user)
+        self.post_range = Post.objects.aggregate(Min('pk'), Max('pk'))
+        if self.post_range['pk__min'] is None:
+            raise CommandError('В базе нет постов: запустите generate_data.')
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+
+        page_cache_timeout = (settings.PAGE_CACHE_TIMEOUT
+                              if options['page_cache'] else 0)
+        results = {
+            'posts': Post.objects.count(),
+            'users': User.objects.count(),
+            'debug': settings.DEBUG,
+            'page_cache_timeout': page_cache_timeout,
+            'scenarios': {},
+        }
+        with override_settings(PAGE_CACHE_TIMEOUT=page_cache_timeout):
+            for name in options['scenarios'] or SCENARIOS:
+                scenario = getattr(self, f'scenario_{name}')
+                for _ in range(options['warmup']):
+                    self.request(*scenario())
+                results['scenarios'][name] = self.run(
+                    scenario, options['requests'])
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Нет пользователя {username}.')
+        stats = AuthorStats.objects.select_related('user').order_by(
+            '-following_count').first()
+        if stats is None:
+            raise CommandError('В базе нет пользователей.')
+        return stats.user
+
+    def login(self, user):
+        client = Client()
+        client.force_login(user)
+        # Один и тот же секрет в cookie и в форме проходит проверку CSRF.
+        csrf = get_random_string(32)
+        return {
+            settings.SESSION_COOKIE_NAME:
+                client.cookies[settings.SESSION_COOKIE_NAME].value,
+            settings.CSRF_COOKIE_NAME: csrf,
+        }
+
+    def run(self, scenario, count):
+        timings, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(count):
+            request = scenario()
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                start = time.perf_counter()
+                status = self.request(*request)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(counter.count)
+            if status >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        result = {
+            'requests': count,
+            'errors': errors,
+            'throughput_rps': round(count / elapsed, 2),
+            'mean_ms': round(sum(timings) / count, 3),
+            'queries_per_request': round(sum(queries) / count, 2),
+            'max_queries': max(queries),
+        }
+        for percent in PERCENTILES:
+            result[f'p{percent}_ms'] = round(percentile(timings, percent), 3)
+        return result
+
+    def request(self, path, data=None, anonymous=False):
+        body = b''
+        environ = {
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'HTTP_HOST': self.host,
+            'SERVER_NAME': self.host,
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.errors': io.StringIO(),
+        }
+        if '?' in path:
+            environ['PATH_INFO'], environ['QUERY_STRING'] = path.split('?')
+        if not anonymous:
+            environ['HTTP_COOKIE'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items())
+        if data is not None:
+            data['csrfmiddlewaretoken'] = self.cookies[
+                settings.CSRF_COOKIE_NAME]
+            body = urlencode(data).encode()
+            environ.update({
+                'REQUEST_METHOD': 'POST',
+                'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+                'CONTENT_LENGTH': str(len(body)),
+            })
+        environ['wsgi.input'] = io.BytesIO(body)
+        setup_testing_defaults(environ)
+        status = []
+        response = self.app(
+            environ, lambda code, headers: status.append(int(code[:3])))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return status[0]
+
+    def random_post(self):
+        pk = self.rng.randint(self.post_range['pk__min'],
+                              self.post_range['pk__max'])
+        return Post.objects.filter(pk__gte=pk).only(
+            'pk', 'author__username').select_related('author').first()
+
+    def random_page(self):
+        return f'?page={self.rng.randint(1, 20)}'
+
+    def scenario_index(self):
+        return (reverse('posts:index') + self.random_page(), None, True)
+
+    def scenario_group_posts(self):
+        if not self.groups:
+            raise CommandError('В базе нет групп.')
+        slug = self.rng.choice(self.groups)
+        return (reverse('posts:group_list', kwargs={'slug': slug})
+                + self.random_page(), None, True)
+
+    def scenario_profile(self):
+        post = self.random_post()
+        return (reverse('posts:profile',
+                        kwargs={'username': post.author.username}),
+                None, True)
+
+    def scenario_post_detail(self):
+        post = self.random_post()
+        return (reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+                None, True)
+
+    def scenario_follow_index(self):
+        return (reverse('posts:follow_index') + self.random_page(),)
+
+    def scenario_post_create(self):
+        return (reverse('posts:post_create'),
+                {'text': f'Нагрузочный пост {self.rng.random()}'})
+
+    def scenario_add_comment(self):
+        post = self.random_post()
+        return (reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+                {'text': f'Нагрузочный комментарий {self.rng.random()}'})
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts.cleanup import BUDGET, GRACE, RATE, collect
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки, на которые не ссылаются посты, и ненужные '
+            'миниатюры вместе с их записями в KVStore. Обход продолжается '
+            'с места, где остановился прошлый запуск, поэтому команду можно '
+            'регулярно запускать на работающем сервере.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, default=BUDGET,
+                            help='Время работы одного запуска в секундах.')
+        parser.add_argument('--rate', type=float, default=RATE,
+                            help='Число обращений к файлам в секунду; '
+                                 '0 — без ограничений.')
+        parser.add_argument('--grace', type=int, default=GRACE,
+                            help='Файлы моложе стольких секунд не удаляются.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, ничего не удаляя.')
+
+    def handle(self, *args, **options):
+        result = collect(options['budget'], options['rate'],
+                         options['grace'], options['dry_run'])
+        self.stdout.write(
+            f'Проверено: {result["checked"]}, удалено: {result["removed"]} '
+            f'({result["freed"] // 1024} КБ)')
+        self.stdout.write('Обход завершён' if result['done']
+                          else 'Обход продолжится при следующем запуске')
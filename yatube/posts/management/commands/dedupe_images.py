@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.cache import bump
+from posts.models import Post
+from posts.storage import image_storage
+from posts.thumbnails import generate
+
+CONTENT_ADDRESSED = r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.'
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов, загруженные до хранилища по хешу '
+            'содержимого, в его каталоги: одинаковые файлы сливаются в один, '
+            'посты переключаются на новые имена, для которых сразу '
+            'создаются миниатюры. Старые файлы и миниатюры потом удаляет '
+            'clean_media.')
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').exclude(
+            image__regex=CONTENT_ADDRESSED
+        ).order_by().values_list('image', 'image_width').distinct()
+        moved, names, missing = 0, set(), 0
+        scopes = {'index'}
+        for old, width in list(images):
+            if not image_storage.exists(old):
+                missing += 1
+                continue
+            with image_storage.open(old) as content:
+                name = image_storage.save(old, content)
+            generate(name, width)
+            posts = Post.objects.filter(image=old)
+            # update() обходит сигналы: ключи карточек и версии страниц
+            # с этими постами меняются здесь.
+            for pk, username, slug in posts.values_list(
+                    'pk', 'author__username', 'group__slug'):
+                scopes.update({f'post:{pk}', f'profile:{username}'})
+                if slug:
+                    scopes.add(f'group:{slug}')
+            moved += posts.update(image=name, updated=timezone.now())
+            names.add(name)
+        if moved:
+            bump(*scopes)
+        self.stdout.write(
+            f'Перенесено постов: {moved}, файлов: {len(names)}, '
+            f'нет файла: {missing}')
@@ -0,0 +1,46 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ._utils import BATCH_SIZE, EXPORT_MODELS, export_fields, open_stream
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """Сохраняет даты с микросекундами, которые DjangoJSONEncoder
+    отбрасывает: по ним упорядочены ленты и комментарии."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии и подписки '
+            'в NDJSON: по объекту на строку, модели по порядку зависимостей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Файл выгрузки, .gz — со сжатием; '
+                                 'по умолчанию — стандартный вывод.')
+
+    def handle(self, *args, **options):
+        encoder = ExportEncoder(ensure_ascii=False)
+        with open_stream(options['output'], 'w') as output:
+            for model in EXPORT_MODELS:
+                label = model._meta.label_lower
+                fields = export_fields(model)
+                names = [field.name for field in fields]
+                rows = model._default_manager.order_by('pk').values_list(
+                    'pk', *[field.attname for field in fields])
+                count = 0
+                for pk, *values in rows.iterator(chunk_size=BATCH_SIZE):
+                    output.write(encoder.encode({
+                        'model': label,
+                        'pk': pk,
+                        'fields': dict(zip(names, values)),
+                    }) + '\n')
+                    count += 1
+                self.stderr.write(
+                    f'{model._meta.verbose_name_plural}: {count}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.feeds import backfill
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = ('Заполняет ленты подписок по текущим подпискам. Нужна при '
+            'переключении FOLLOW_FEED_STRATEGY с pull на push.')
+
+    def handle(self, *args, **options):
+        count = 0
+        for follow in Follow.objects.only('user', 'author').iterator():
+            backfill(follow)
+            count += 1
+        self.stdout.write(f'Обработано подписок: {count}')
@@ -0,0 +1,181 @@
+import io
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import autocomplete
+from posts.models import Comment, Follow, Group, Post, User
+from posts.storage import image_storage
+from ._utils import batched, explicit_dates
+
+# Показатель степенного распределения: чем он больше, тем сильнее посты
+# и подписчики сосредоточены у немногих популярных авторов.
+SKEW = 1.1
+IMAGE_SIZE = (960, 540)
+# Тексты выбираются из заранее созданного набора: Faker слишком медленный,
+# чтобы генерировать миллионы строк по одной.
+TEXT_POOL_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу воспроизводимым набором данных заданного '
+            'размера: пользователи, группы, посты, комментарии, подписки '
+            'и картинки. Запускается на пустой базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=3000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument('--images', type=int, default=5,
+                            help='Число разных картинок.')
+        parser.add_argument('--image-share', type=float, default=0.1,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты.')
+        parser.add_argument('--password', default='yatube')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days']).total_seconds()
+        self.paragraphs = [self.fake.paragraph(nb_sentences=5)
+                           for _ in range(TEXT_POOL_SIZE)]
+        self.sentences = [self.fake.sentence()
+                          for _ in range(TEXT_POOL_SIZE)]
+
+        users = self.create_users(options['users'], options['password'])
+        groups = self.create_groups(options['groups'])
+        images = self.create_images(options['images'])
+        # Популярность авторов задаётся случайной перестановкой, чтобы
+        # первые пользователи не были всегда самыми популярными.
+        authors = users[:]
+        self.rng.shuffle(authors)
+        weights = list(accumulate(
+            1 / (rank + 1) ** SKEW for rank in range(len(authors))
+        ))
+        with explicit_dates():
+            posts = self.create_posts(options['posts'], authors, weights,
+                                      groups, images, options['image_share'])
+            self.create_comments(options['comments'], users, posts)
+        self.create_follows(options['follows'], users, authors, weights)
+
+        # bulk_create не шлёт сигналов: индекс подсказок перестроится
+        # при следующем запросе.
+        autocomplete.invalidate()
+        call_command('repair_counters', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        if settings.FOLLOW_FEED_STRATEGY == 'push':
+            call_command('fill_follow_feed', stdout=self.stdout)
+
+    def insert(self, model, objects):
+        count = 0
+        for batch in batched(objects):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {count}')
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.rng.uniform(0, self.span))
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        self.insert(User, (
+            User(
+                username=f'{self.fake.user_name()}_{i}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                email=self.fake.email(),
+                password=password,
+            )
+            for i in range(count)
+        ))
+        return list(User.objects.order_by('pk').values_list('pk', flat=True))
+
+    def create_groups(self, count):
+        self.insert(Group, (
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'{self.fake.slug()[:80]}-{i}',
+                description=self.fake.paragraph(),
+            )
+            for i in range(count)
+        ))
+        return list(Group.objects.values_list('pk', flat=True))
+
+    def create_images(self, count):
+        names = []
+        for i in range(count):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            image = Image.new('RGB', IMAGE_SIZE, color)
+            content = io.BytesIO()
+            image.save(content, 'JPEG')
+            names.append(image_storage.save(
+                f'posts/generated_{i}.jpg', ContentFile(content.getvalue())
+            ))
+        return names
+
+    def create_posts(self, count, authors, weights, groups, images,
+                     image_share):
+        def posts():
+            for _ in range(count):
+                author = self.rng.choices(authors, cum_weights=weights)[0]
+                image, size = '', (None, None)
+                if images and self.rng.random() < image_share:
+                    image, size = self.rng.choice(images), IMAGE_SIZE
+                pub_date = self.random_date()
+                yield Post(
+                    text=self.rng.choice(self.paragraphs),
+                    author_id=author,
+                    group_id=self.rng.choice(groups + [None]),
+                    image=image,
+                    image_width=size[0],
+                    image_height=size[1],
+                    pub_date=pub_date,
+                    updated=pub_date,
+                )
+
+        self.insert(Post, posts())
+        # Посты получают идущие подряд id, поэтому дальше их можно
+        # выбирать из диапазона, не загружая в память.
+        last = Post.objects.aggregate(Max('pk'))['pk__max'] or 0
+        return range(last - count + 1, last + 1)
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return
+        self.insert(Comment, (
+            Comment(
+                post_id=self.rng.choice(posts),
+                author_id=self.rng.choice(users),
+                text=self.rng.choice(self.sentences),
+                created=self.random_date(),
+            )
+            for _ in range(count)
+        ))
+
+    def create_follows(self, count, users, authors, weights):
+        # Подписчики выбираются равномерно, а авторы — по степенному закону,
+        # так что у немногих авторов оказывается большинство подписчиков.
+        def follows():
+            for _ in range(count):
+                user = self.rng.choice(users)
+                author = self.rng.choices(authors, cum_weights=weights)[0]
+                if user != author:
+                    yield Follow(user_id=user, author_id=author)
+
+        self.insert(Follow, follows())
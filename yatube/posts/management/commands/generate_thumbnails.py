@@ -0,0 +1,41 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import GENERATED, MISSING, FAILED, generate
+
+CHUNK_SIZE = 20
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры всех картинок постов в пуле процессов, '
+            'чтобы шаблоны находили их готовыми. Уже созданные миниатюры '
+            'пропускаются, отсутствующие файлы не считаются ошибкой.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Число процессов; 0 — без пула.')
+        parser.add_argument('--chunk', type=int, default=CHUNK_SIZE,
+                            help='Число картинок в одном задании процесса.')
+
+    def handle(self, *args, **options):
+        images = list(Post.objects.exclude(image='').order_by().values_list(
+            'image', 'image_width').distinct())
+        names, widths = zip(*images) if images else ((), ())
+        if options['workers']:
+            # Процессы не должны делить с родителем открытые соединения.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'],
+                                     initializer=django.setup) as executor:
+                results = Counter(executor.map(
+                    generate, names, widths, chunksize=options['chunk']))
+        else:
+            results = Counter(map(generate, names, widths))
+        self.stdout.write(
+            f'Создано: {results[GENERATED]}, '
+            f'нет файла: {results[MISSING]}, ошибок: {results[FAILED]}')
@@ -0,0 +1,154 @@
+import json
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DateTimeField, Max
+
+from ._utils import EXPORT_MODELS, export_fields, open_stream
+
+# Пакет занимает в памяти единицы мегабайт, а каждая транзакция — это
+# fsync, поэтому пакеты импорта крупнее обычных.
+IMPORT_BATCH_SIZE = 10000
+
+
+def parse_datetime(field, value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return field.to_python(value)
+
+
+class Command(BaseCommand):
+    help = ('Загружает выгрузку export_data пакетами в транзакциях. '
+            'id загружаемых объектов и ссылки между ними сдвигаются на '
+            'наибольший id в базе, так что выгрузку можно добавить к '
+            'существующим данным. Сигналы не вызываются: счётчики, поиск, '
+            'ленты и кэш пересчитываются после загрузки, даже прерванной. '
+            'Пакеты, загруженные до ошибки, остаются в базе; команда '
+            'печатает id, больше которых их нужно удалить, чтобы '
+            'повторить загрузку.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',
+                            help='Файл выгрузки, .gz — со сжатием; '
+                                 'по умолчанию — стандартный ввод.')
+
+    def handle(self, *args, **options):
+        models = {model._meta.label_lower: model for model in EXPORT_MODELS}
+        self.offsets = {
+            model: model._default_manager.aggregate(
+                Max('pk'))['pk__max'] or 0
+            for model in EXPORT_MODELS
+        }
+        self.fields = {
+            model: export_fields(model) for model in EXPORT_MODELS
+        }
+        self.inserts = {model: self.insert_sql(model)
+                        for model in EXPORT_MODELS}
+        started = time.perf_counter()
+        self.total = 0
+        try:
+            self.load(options['input'], models)
+        except BaseException:
+            # Уже загруженные пакеты должны быть видны целиком: с верными
+            # счётчиками, в поиске, в лентах и без старых копий в кэше.
+            if self.total:
+                self.finish()
+                self.stderr.write(self.recovery_hint())
+            raise
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Загружено объектов: {self.total} '
+            f'({self.total / elapsed:.0f} в секунду)')
+        self.finish()
+
+    def load(self, path, models):
+        model, batch = None, []
+        with open_stream(path, 'r') as stream:
+            for number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record['model'] not in models:
+                    raise CommandError(
+                        f'Строка {number}: неизвестная модель '
+                        f'{record["model"]}.')
+                if models[record['model']] is not model or (
+                        len(batch) == IMPORT_BATCH_SIZE):
+                    self.flush(model, batch)
+                    model, batch = models[record['model']], []
+                batch.append(self.build(model, record))
+            self.flush(model, batch)
+
+    def finish(self):
+        self.reset_sequences()
+        call_command('repair_counters', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        if settings.FOLLOW_FEED_STRATEGY == 'push':
+            call_command('fill_follow_feed', stdout=self.stdout)
+        # В кэше лежат страницы, индексы и счётчики лент без новых данных.
+        cache.clear()
+
+    def recovery_hint(self):
+        bounds = ', '.join(
+            f'{model._meta.label_lower} > {offset}'
+            for model, offset in self.offsets.items()
+        )
+        return (
+            f'Загрузка прервана, в базе уже {self.total} объектов из '
+            f'выгрузки. Чтобы загрузить её заново, удалите объекты с id '
+            f'больше прежних: {bounds}.')
+
+    def insert_sql(self, model):
+        quote = connection.ops.quote_name
+        columns = [model._meta.pk.column] + [
+            field.column for field in self.fields[model]]
+        return (
+            f'INSERT INTO {quote(model._meta.db_table)} '
+            f'({", ".join(map(quote, columns))}) '
+            f'VALUES ({", ".join(["%s"] * len(columns))})'
+        )
+
+    def build(self, model, record):
+        """Строка для INSERT: id и ссылки сдвинуты, даты приведены
+        к формату базы, остальные значения JSON подходят как есть."""
+        values = record['fields']
+        row = [record['pk'] + self.offsets[model]]
+        for field in self.fields[model]:
+            value = values[field.name]
+            if value is None:
+                pass
+            elif field.is_relation:
+                value += self.offsets[field.related_model]
+            elif isinstance(field, DateTimeField):
+                value = connection.ops.adapt_datetimefield_value(
+                    parse_datetime(field, value))
+            row.append(value)
+        return row
+
+    def flush(self, model, batch):
+        # bulk_create тратит большую часть времени на подготовку каждого
+        # значения, поэтому пакет вставляется одним executemany.
+        if not batch:
+            return
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(self.inserts[model], batch)
+        except IntegrityError as error:
+            raise CommandError(
+                f'{model._meta.verbose_name_plural}: {error}. Возможно, '
+                f'такие объекты уже есть в базе.')
+        self.total += len(batch)
+
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), EXPORT_MODELS)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import REBUILD_CHUNK, rebuild
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает индекс полнотекстового поиска по постам '
+            'порциями. Нужна после загрузки данных в обход сигналов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=REBUILD_CHUNK,
+                            help='Число id постов в одной порции.')
+
+    def handle(self, *args, **options):
+        count = rebuild(options['chunk'])
+        self.stdout.write(f'Проиндексировано постов: {count}')
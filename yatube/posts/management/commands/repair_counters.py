@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import AuthorStats, Comment, Follow, Post, User
+from ._utils import BATCH_SIZE, batched
+
+
+def count(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(Subquery(
+        rows.values(field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписчиков, подписок и '
+            'комментариев и исправляет разошедшиеся.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Исправлено авторов: {self.repair_stats()}')
+        self.stdout.write(f'Исправлено постов: {self.repair_comments()}')
+
+    def repair_stats(self):
+        fields = ('posts_count', 'followers_count', 'following_count')
+        users = User.objects.order_by('pk').annotate(
+            actual_posts=count(Post, 'author'),
+            actual_followers=count(Follow, 'author'),
+            actual_following=count(Follow, 'user'),
+        ).values_list('pk', 'actual_posts', 'actual_followers',
+                      'actual_following')
+        repaired = 0
+        for batch in batched(users.iterator(chunk_size=BATCH_SIZE)):
+            existing = AuthorStats.objects.in_bulk([row[0] for row in batch])
+            created, changed = [], []
+            for pk, *counts in batch:
+                stats = existing.get(pk)
+                if stats is None:
+                    created.append(AuthorStats(
+                        user_id=pk, **dict(zip(fields, counts))))
+                elif [getattr(stats, field) for field in fields] != counts:
+                    for field, value in zip(fields, counts):
+                        setattr(stats, field, value)
+                    changed.append(stats)
+            with transaction.atomic():
+                AuthorStats.objects.bulk_create(created)
+                AuthorStats.objects.bulk_update(changed, fields)
+            repaired += len(created) + len(changed)
+        return repaired
+
+    def repair_comments(self):
+        posts = Post.objects.order_by('pk').annotate(
+            actual=count(Comment, 'post')
+        ).values_list('pk', 'comments_count', 'actual')
+        repaired = 0
+        for batch in batched(posts.iterator(chunk_size=BATCH_SIZE)):
+            changed = [
+                Post(pk=pk, comments_count=actual)
+                for pk, stored, actual in batch if stored != actual
+            ]
+            Post.objects.bulk_update(changed, ['comments_count'])
+            repaired += len(changed)
+        return repaired
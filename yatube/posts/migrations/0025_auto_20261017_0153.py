@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-17 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_auto_20261017_0152'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='posts_comment_created_idx'),
+        ),
+    ]
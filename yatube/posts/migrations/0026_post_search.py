@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Индекс полнотекстового поиска по постам. Обычная таблица FTS5 хранит
+# свою копию текста, из которой строятся сниппеты; rowid совпадает с id
+# поста. unicode61 приводит кириллицу к нижнему регистру, «ё» заменяется
+# на «е» при индексации, а префиксные индексы ускоряют поиск по началу
+# слова.
+CREATE_SQL = '''
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text, author, grp,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+'''
+FILL_SQL = '''
+    INSERT INTO posts_post_fts (rowid, text, author, grp)
+    SELECT p.id, replace(replace(p.text, 'ё', 'е'), 'Ё', 'Е'),
+           u.username || ' ' || u.first_name || ' ' || u.last_name,
+           COALESCE(g.title, '')
+    FROM posts_post p
+    JOIN auth_user u ON u.id = p.author_id
+    LEFT JOIN posts_group g ON g.id = p.group_id
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_auto_20261017_0153'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [CREATE_SQL, FILL_SQL],
+            'DROP TABLE posts_post_fts',
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-17 02:33
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from PIL import Image
+
+
+def fill_image_size(apps, schema_editor):
+    # Размер читается из заголовка, сама картинка не декодируется;
+    # у постов с отсутствующими файлами размер остаётся пустым.
+    Post = apps.get_model('posts', 'Post')
+    names = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True).distinct()
+    for name in list(names):
+        try:
+            with default_storage.open(name) as file:
+                with Image.open(file) as image:
+                    width, height = image.size
+        except (OSError, ValueError):
+            continue
+        Post.objects.filter(image=name).update(
+            image_width=width, image_height=height)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0027_auto_20261017_0224'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(fill_image_size, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import F, UniqueConstraint
+
+from .storage import image_storage
 
 User = get_user_model()
 
@@ -23,6 +25,7 @@ class Post(models.Model):
 
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True,
                                     db_index=True)
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -41,14 +44,30 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=image_storage,
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        "Ширина картинки", null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        "Высота картинки", null=True, blank=True, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        "Число комментариев", default=0, editable=False
+    )
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['group', 'pub_date'],
+                         name='posts_group_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='posts_author_pub_date_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -68,9 +87,14 @@ class Comment(models.Model):
     )
     text = models.TextField("Текст комментария",
                             help_text='Напишите комментарий')
-    created = models.DateTimeField("Дата добавления", auto_now_add=True)
+    created = models.DateTimeField("Дата добавления", auto_now_add=True,
+                                   db_index=True)
 
     class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='posts_comment_created_idx'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -96,3 +120,90 @@ class Follow(models.Model):
         ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        related_name='feed_items',
+        verbose_name="Подписчик",
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_items',
+        verbose_name="Пост",
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        verbose_name="Автор",
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['user', 'post'],
+                             name='unique_feed_item')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date'],
+                         name='posts_feed_user_pub_date_idx'),
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="Пользователь",
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField("Число постов", default=0)
+    followers_count = models.PositiveIntegerField(
+        "Число подписчиков", default=0, db_index=True
+    )
+    following_count = models.PositiveIntegerField("Число подписок",
+                                                  default=0)
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    @classmethod
+    def recount(cls, user_id):
+        stats, _ = cls.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                'posts_count': Post.objects.filter(author=user_id).count(),
+                'followers_count': Follow.objects.filter(
+                    author=user_id).count(),
+                'following_count': Follow.objects.filter(
+                    user=user_id).count(),
+            },
+        )
+        return stats
+
+    @classmethod
+    def for_user(cls, user):
+        try:
+            return user.stats
+        except cls.DoesNotExist:
+            return cls.recount(user.pk)
+
+    @classmethod
+    def change(cls, user_id, field, delta):
+        # Счётчик не уходит ниже нуля, даже если разошёлся с данными:
+        # расхождения чинит команда repair_counters. Отсутствующая строка
+        # создаётся только при росте счётчика, чтобы не воскрешать её при
+        # каскадном удалении пользователя.
+        updated = cls.objects.filter(
+            user_id=user_id, **{f'{field}__gte': -delta}
+        ).update(**{field: F(field) + delta})
+        if not updated and delta > 0:
+            cls.recount(user_id)
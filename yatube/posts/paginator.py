@@ -0,0 +1,269 @@
+import time
+from datetime import datetime
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+# Контрольная точка индекса ставится на каждой SEEK_INDEX_STRIDE-й строке
+# ленты, так что OFFSET от ближайшей точки не превышает
+# SEEK_INDEX_STRIDE - 1 строк на любой глубине ленты.
+SEEK_INDEX_STRIDE = 100
+SEEK_INDEX_TIMEOUT = 300
+# Индекс строит один запрос, остальные ждут его до SEEK_INDEX_WAIT секунд.
+SEEK_INDEX_LOCK_TIMEOUT = 30
+SEEK_INDEX_WAIT = 1
+SEEK_INDEX_POLL = 0.05
+FEED_COUNT_TIMEOUT = 60 * 60 * 24
+CACHED_COUNT_TIMEOUT = 60
+CURSOR_DATE_FORMAT = '%Y%m%d%H%M%S%f'
+
+
+def feed_count_key(key):
+    return f'feed-count:{key}'
+
+
+def feed_keys(post):
+    """Ключи лент, в которые попадает пост."""
+    keys = ['index', f'profile:{post.author_id}']
+    if post.group_id:
+        keys.append(f'group:{post.group_id}')
+    return keys
+
+
+def index_key(key):
+    return f'seek-index:{key}'
+
+
+def drop_indexes(keys):
+    """Сбрасывает индексы лент, состав которых изменился: позиции
+    контрольных точек после вставки или удаления поста уже неверны."""
+    cache.delete_many([index_key(key) for key in keys])
+
+
+def change_feed_count(key, delta, at_head=False):
+    """Меняет счётчик ленты.
+
+    Пост, добавленный в начало ленты (at_head), только сдвигает контрольные
+    точки индекса на одну позицию, и FeedPaginator учитывает сдвиг по
+    разнице счётчика и размера из индекса. Удаление или вставка в середину
+    ленты сбрасывает индекс.
+    """
+    if not at_head:
+        drop_indexes([key])
+    try:
+        cache.incr(feed_count_key(key), delta)
+    except ValueError:
+        # Счётчика ещё нет: его посчитает первый запрос ленты, а сдвиг
+        # без счётчика не посчитать.
+        drop_indexes([key])
+
+
+class SeekPaginator(Paginator):
+    """Пагинатор ленты постов, выбирающий страницы по курсору (pub_date, id).
+
+    Вместо LIMIT/OFFSET на всю глубину ленты страница ищется от ближайшей
+    контрольной точки индекса, который хранится в кэше под ключом ленты
+    и сбрасывается сигналами при изменении её состава. Индекс заодно
+    хранит размер ленты, поэтому COUNT(*) на каждый запрос не выполняется.
+    """
+
+    def __init__(self, object_list, per_page, key, **kwargs):
+        super().__init__(
+            object_list.order_by('-pub_date', '-pk'), per_page, **kwargs
+        )
+        self.key = key
+        self.stale = False
+
+    @cached_property
+    def index(self):
+        index = cache.get(index_key(self.key))
+        if index is None:
+            index = self.build_index()
+        return index
+
+    def build_index(self):
+        """Строит индекс одним запросом: номера строк и размер ленты
+        считает оконная функция в базе, а в Python приходят только
+        контрольные точки.
+
+        Пока индекс строит другой запрос, этот ждёт его результата, а не
+        повторяет тот же запрос.
+        """
+        lock = f'{index_key(self.key)}:lock'
+        if not cache.add(lock, True, SEEK_INDEX_LOCK_TIMEOUT):
+            index = self.wait_for_index()
+            if index is not None:
+                return index
+        order = (F('pub_date').desc(), F('pk').desc())
+        rows = self.object_list.annotate(
+            position=Window(RowNumber(), order_by=order),
+            total=Window(Count('pk')),
+        ).values('pk', 'pub_date', 'position', 'total')
+        sql, params = rows.query.sql_with_params()
+        # raw(), а не курсор: даты проходят через конвертеры поля.
+        found = list(self.object_list.model.objects.using(rows.db).raw(
+            f'SELECT * FROM ({sql}) rows '
+            f'WHERE (position - 1) %% %s = 0 ORDER BY position',
+            (*params, SEEK_INDEX_STRIDE),
+        ))
+        index = {
+            'count': found[0].total if found else 0,
+            'checkpoints': [(row.pub_date, row.pk) for row in found],
+        }
+        cache.set(index_key(self.key), index, SEEK_INDEX_TIMEOUT)
+        cache.delete(lock)
+        return index
+
+    def wait_for_index(self):
+        deadline = time.monotonic() + SEEK_INDEX_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(SEEK_INDEX_POLL)
+            index = cache.get(index_key(self.key))
+            if index is not None:
+                return index
+        return None
+
+    def refresh(self):
+        cache.delete(index_key(self.key))
+        for name in ('index', 'count', 'num_pages', 'shift'):
+            self.__dict__.pop(name, None)
+        self.stale = False
+
+    @cached_property
+    def count(self):
+        return self.index['count']
+
+    @cached_property
+    def shift(self):
+        """На сколько позиций сдвинулись контрольные точки из-за постов,
+        добавленных в начало ленты после построения индекса. Когда сдвиг
+        доходит до шага индекса, индекс перестраивается."""
+        shift = self.count - self.index['count']
+        if 0 <= shift < SEEK_INDEX_STRIDE:
+            return shift
+        self.index = self.build_index()
+        if self.count != self.index['count']:
+            # Счётчик разошёлся с базой: get_page пересчитает его.
+            self.stale = True
+        return 0
+
+    def seek(self, bottom):
+        """Возвращает queryset, начинающийся не дальше шага индекса
+        от позиции bottom, и оставшийся OFFSET."""
+        queryset = self.object_list
+        # Первой странице индекс не нужен, а до первой сдвинутой точки
+        # OFFSET меньше двух шагов индекса.
+        if (bottom < SEEK_INDEX_STRIDE
+                or bottom < self.shift + SEEK_INDEX_STRIDE):
+            return queryset, bottom
+        checkpoint, offset = divmod(bottom - self.shift, SEEK_INDEX_STRIDE)
+        if checkpoint:
+            checkpoints = self.index['checkpoints']
+            if checkpoint >= len(checkpoints):
+                self.stale = True
+                return queryset, bottom
+            pub_date, pk = checkpoints[checkpoint]
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lte=pk)
+            )
+        return queryset, offset
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        queryset, offset = self.seek(bottom)
+        # Лишняя строка показывает, есть ли что-то за страницей: если это
+        # расходится с размером из индекса, индекс устарел.
+        rows = list(queryset[offset:offset + self.per_page + 1])
+        expected = max(min(self.per_page, self.count - bottom), 0)
+        has_more = bottom + self.per_page < self.count
+        if len(rows[:self.per_page]) != expected or (
+                len(rows) > self.per_page) != has_more:
+            self.stale = True
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        if self.stale:
+            self.refresh()
+            page = super().get_page(number)
+        return page
+
+
+class FeedPaginator(SeekPaginator):
+    """Пагинатор с размером ленты из счётчика в кэше.
+
+    Счётчик заводится при первом запросе ленты и дальше меняется сигналами
+    при создании и удалении постов, так что размер ленты точен и между
+    перестроениями индекса.
+    """
+
+    @cached_property
+    def count(self):
+        count = cache.get(feed_count_key(self.key))
+        if count is None:
+            count = self.index['count']
+            cache.add(feed_count_key(self.key), count, FEED_COUNT_TIMEOUT)
+        return count
+
+    def refresh(self):
+        cache.delete(feed_count_key(self.key))
+        super().refresh()
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, запоминающий COUNT(*) запроса в кэше на
+    CACHED_COUNT_TIMEOUT секунд.
+
+    Размер списка может отставать от базы на это время, зато полный
+    подсчёт большой таблицы не повторяется на каждой странице.
+    """
+
+    @cached_property
+    def count(self):
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'count:' + md5(f'{sql}:{params}'.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, CACHED_COUNT_TIMEOUT)
+        return count
+
+
+def encode_cursor(obj):
+    created = obj.created.astimezone(timezone.utc)
+    return f'{created.strftime(CURSOR_DATE_FORMAT)}-{obj.pk}'
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор вида <дата>-<id>, для неверного возвращает None."""
+    try:
+        created, pk = cursor.split('-')
+        created = datetime.strptime(created, CURSOR_DATE_FORMAT)
+        return created.replace(tzinfo=timezone.utc), int(pk)
+    except ValueError:
+        return None
+
+
+def cursor_batch(queryset, per_page, after=None):
+    """Возвращает порцию объектов после курсора в порядке (created, id)
+    и курсор следующей порции или None, если порция последняя.
+
+    Порция выбирается по индексу без OFFSET, поэтому её стоимость не
+    зависит от того, насколько далеко она от начала.
+    """
+    queryset = queryset.order_by('created', 'pk')
+    if after is not None:
+        created, pk = after
+        queryset = queryset.filter(
+            Q(created__gt=created) | Q(created=created, pk__gt=pk)
+        )
+    rows = list(queryset[:per_page + 1])
+    batch = rows[:per_page]
+    next_cursor = encode_cursor(batch[-1]) if len(rows) > per_page else None
+    return batch, next_cursor
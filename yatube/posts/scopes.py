@@ -0,0 +1,37 @@
+from django.core.cache import cache
+
+# Страница поста показывает число постов автора, его имя и название
+# группы. Вместо того чтобы сбрасывать версии страниц всех постов автора
+# или группы, страница зависит от общих областей автора и группы, а
+# какие это области, запоминается в кэше по номеру поста.
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def group_title_scope(group_id):
+    return f'group-title:{group_id}'
+
+
+def post_scopes_key(post_id):
+    return f'post-scopes:{post_id}'
+
+
+def remember_post(post):
+    """Запоминает области автора и группы для страницы поста."""
+    scopes = [author_scope(post.author_id)]
+    if post.group_id:
+        scopes.append(group_title_scope(post.group_id))
+    cache.set(post_scopes_key(post.pk), scopes, None)
+
+
+def forget_post(post_id):
+    cache.delete(post_scopes_key(post_id))
+
+
+def post_page_scopes(post_id, **kwargs):
+    """Области автора и группы страницы поста без запроса к базе. Пока
+    они не запомнены, страница не берётся из кэша и не отдаёт 304."""
+    scopes = cache.get(post_scopes_key(post_id))
+    return [None] if scopes is None else scopes
@@ -0,0 +1,137 @@
+import re
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+REBUILD_CHUNK = 10000
+MAX_TERMS = 10
+SNIPPET_TOKENS = 24
+# Веса BM25 для колонок text, author и grp: совпадение в тексте поста
+# важнее совпадения в имени автора или названии группы.
+RANK_WEIGHTS = (1.0, 0.5, 0.5)
+# Границы совпадений в сниппете: управляющие символы не встречаются в
+# тексте и переживают экранирование HTML.
+MARK_START, MARK_END = '\x02', '\x03'
+
+INDEX_SQL = f'''
+    INSERT OR REPLACE INTO {FTS_TABLE} (rowid, text, author, grp)
+    SELECT p.id, replace(replace(p.text, 'ё', 'е'), 'Ё', 'Е'),
+           u.username || ' ' || u.first_name || ' ' || u.last_name,
+           COALESCE(g.title, '')
+    FROM posts_post p
+    JOIN auth_user u ON u.id = p.author_id
+    LEFT JOIN posts_group g ON g.id = p.group_id
+    WHERE {{where}}
+'''
+
+
+def execute(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        if cursor.description:
+            return cursor.fetchall()
+
+
+def reindex(where, params):
+    """Переиндексирует посты, выбранные условием над posts_post p:
+    строки с теми же rowid заменяются."""
+    execute(INDEX_SQL.format(where=where), params)
+
+
+def index_post(post):
+    reindex('p.id = %s', [post.pk])
+
+
+def unindex_post(post_id):
+    execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def reindex_author(user):
+    reindex('p.author_id = %s', [user.pk])
+
+
+def reindex_group(group):
+    reindex('p.group_id = %s', [group.pk])
+
+
+def rebuild(chunk=REBUILD_CHUNK):
+    """Перестраивает индекс диапазонами id по chunk постов и возвращает
+    число проиндексированных постов."""
+    execute(f'DELETE FROM {FTS_TABLE}')
+    last = Post.objects.order_by('-pk').values_list('pk', flat=True).first()
+    for start in range(0, last or 0, chunk):
+        execute(INDEX_SQL.format(where='p.id > %s AND p.id <= %s'),
+                [start, start + chunk])
+    execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return execute(f'SELECT count(*) FROM {FTS_TABLE}')[0][0]
+
+
+def match_query(query):
+    """Запрос FTS5 из слов пользователя: все слова обязательны и ищутся
+    по началу, так что «пост» находит и «посты», и «постом»."""
+    query = query.lower().replace('ё', 'е')
+    words = re.findall(r'\w+', query)[:MAX_TERMS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под запрос, для фильтра pk__in."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_query(query) or '""'],
+    )
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(
+        MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+class SearchResults:
+    """Найденные посты от более к менее релевантным: пары (id, сниппет)."""
+
+    def __init__(self, query):
+        self.match = match_query(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        return execute(
+            f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [self.match],
+        )[0][0]
+
+    def __getitem__(self, page):
+        if not self.match:
+            return []
+        weights = ', '.join(map(str, RANK_WEIGHTS))
+        return execute(
+            f'''SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, '…',
+                                      {SNIPPET_TOKENS})
+                FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+                ORDER BY bm25({FTS_TABLE}, {weights})
+                LIMIT %s OFFSET %s''',
+            [MARK_START, MARK_END, self.match,
+             page.stop - page.start, page.start],
+        )
+
+
+class SearchPaginator(Paginator):
+    """Листает SearchResults и загружает посты страницы одним запросом,
+    добавляя каждому подсвеченный сниппет."""
+
+    def _get_page(self, object_list, number, paginator):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in object_list])
+        page = []
+        for pk, snippet in object_list:
+            if pk in posts:
+                posts[pk].snippet = highlight(snippet)
+                page.append(posts[pk])
+        return super()._get_page(page, number, paginator)
@@ -0,0 +1,218 @@
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.cache import bump
+from . import autocomplete, feeds, search, thumbnails
+from .scopes import (
+    author_scope, forget_post, group_title_scope, remember_post)
+from .images import dimensions
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .paginator import change_feed_count, feed_keys
+
+
+def bump_post_pages(post, old_group_id=None):
+    group_ids = {post.group_id, old_group_id} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True) if group_ids else []
+    bump('index', f'profile:{post.author.username}', f'post:{post.pk}',
+         *(f'group:{slug}' for slug in slugs))
+
+
+# Поля, которые видны в карточках постов и на страницах постов.
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_NAME_FIELDS = ('slug', 'title')
+
+
+def old_names(instance, fields):
+    """Прежние значения полей, если хоть одно из них меняется, иначе None."""
+    if instance.pk is None:
+        return None
+    old = type(instance).objects.filter(pk=instance.pk).values_list(
+        *fields).first()
+    if old is None or old == tuple(getattr(instance, f) for f in fields):
+        return None
+    return dict(zip(fields, old))
+
+
+def touch_posts(**lookup):
+    """Карточка поста кэшируется по его updated, а показывает имя автора
+    и название группы: их правка должна сменить ключ карточки."""
+    Post.objects.filter(**lookup).update(updated=timezone.now())
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    instance.old_group_id = None
+    instance.old_image = None
+    if raw:
+        return
+    # Размер читается из заголовка новой картинки один раз, чтобы дальше
+    # его не приходилось узнавать, открывая файл.
+    if not instance.image:
+        instance.image_width = instance.image_height = None
+    elif not instance.image._committed or instance.image_width is None:
+        instance.image_width, instance.image_height = dimensions(
+            instance.image)
+    if instance.pk is None:
+        return
+    old = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', 'image').first()
+    if old is None:
+        return
+    old_group_id, instance.old_image = old
+    if old_group_id == instance.group_id:
+        return
+    instance.old_group_id = old_group_id
+    if old_group_id:
+        change_feed_count(f'group:{old_group_id}', -1)
+    if instance.group_id:
+        change_feed_count(f'group:{instance.group_id}', 1)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_post_pages(instance, instance.old_group_id)
+    remember_post(instance)
+    search.index_post(instance)
+    if instance.image and instance.image.name != instance.old_image:
+        thumbnails.schedule(instance.image.name, instance.image_width)
+    if created:
+        AuthorStats.change(instance.author_id, 'posts_count', 1)
+        bump(author_scope(instance.author_id))
+        for key in feed_keys(instance):
+            change_feed_count(key, 1, at_head=True)
+        cache.delete(feeds.timeline_key(instance.author_id))
+        if feeds.push_enabled():
+            feeds.push_post(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # Записи лент подписок удаляются каскадом раньше post_delete.
+    if feeds.push_enabled():
+        feeds.post_removed(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_post_pages(instance)
+    search.unindex_post(instance.pk)
+    AuthorStats.change(instance.author_id, 'posts_count', -1)
+    bump(author_scope(instance.author_id))
+    forget_post(instance.pk)
+    for key in feed_keys(instance):
+        change_feed_count(key, -1)
+    cache.delete(feeds.timeline_key(instance.author_id))
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(
+        pk=post_id, comments_count__gte=-delta
+    ).update(comments_count=F('comments_count') + delta)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump(f'post:{instance.post_id}')
+    if created:
+        change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump(f'post:{instance.post_id}')
+    change_comments_count(instance.post_id, -1)
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, raw=False, **kwargs):
+    instance.old_names = None if raw else old_names(
+        instance, GROUP_NAME_FIELDS)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    bump(f'group:{instance.slug}')
+    old = getattr(instance, 'old_names', None)
+    if raw or not (created or old):
+        return
+    autocomplete.group_changed(instance)
+    if created:
+        return
+    usernames = User.objects.filter(posts__group=instance).values_list(
+        'username', flat=True).distinct()
+    bump('index', f'group:{old["slug"]}', group_title_scope(instance.pk),
+         *(f'profile:{username}' for username in usernames))
+    touch_posts(group=instance)
+    search.reindex_group(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    autocomplete.removed('group', instance.pk)
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, raw=False, update_fields=None,
+                  **kwargs):
+    # Вход и смена пароля не трогают имя: постам обновлять нечего.
+    instance.old_names = None
+    if raw or update_fields is not None and update_fields.isdisjoint(
+            USER_NAME_FIELDS):
+        return
+    instance.old_names = old_names(instance, USER_NAME_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    old = getattr(instance, 'old_names', None)
+    if raw or not (created or old):
+        return
+    if created:
+        # Профиль нового пользователя читает счётчики без пересчёта.
+        AuthorStats.objects.get_or_create(user=instance)
+    autocomplete.user_changed(instance)
+    if created:
+        return
+    slugs = Group.objects.filter(posts__author=instance).values_list(
+        'slug', flat=True).distinct()
+    bump('index', f'profile:{old["username"]}',
+         f'profile:{instance.username}', author_scope(instance.pk),
+         *(f'group:{slug}' for slug in slugs))
+    touch_posts(author=instance)
+    search.reindex_author(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    autocomplete.removed('user', instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump(f'profile:{instance.author.username}', f'user:{instance.user_id}')
+    if not created:
+        return
+    AuthorStats.change(instance.author_id, 'followers_count', 1)
+    AuthorStats.change(instance.user_id, 'following_count', 1)
+    if feeds.push_enabled():
+        feeds.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump(f'profile:{instance.author.username}', f'user:{instance.user_id}')
+    AuthorStats.change(instance.author_id, 'followers_count', -1)
+    AuthorStats.change(instance.user_id, 'following_count', -1)
+    if feeds.push_enabled():
+        feeds.trim(instance)
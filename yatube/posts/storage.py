@@ -0,0 +1,82 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def canonical_extension(name):
+    """Расширение файла в одном написании на тип: .jpeg и .JPG дают .jpg."""
+    extension = posixpath.splitext(name)[1].lower()
+    mime_type = mimetypes.guess_type(name)[0]
+    return mimetypes.guess_extension(mime_type) if mime_type else extension
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по SHA-256 содержимого.
+
+    Файл попадает в каталог upload_to/ab/cd/ по первым байтам хеша, так
+    что ни в одном каталоге не скапливаются тысячи файлов. Одинаковые
+    загрузки получают одно имя: второй раз файл не записывается, а посты
+    ссылаются на общую картинку и её миниатюры. Файл, на который больше
+    никто не ссылается, удаляет clean_media; повторная загрузка обновляет
+    время изменения файла, чтобы clean_media не удалил старую картинку,
+    на которую вот-вот сошлётся новый пост.
+    """
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = content_hash(content)
+        name = posixpath.join(
+            posixpath.dirname(name), digest[:2], digest[2:4],
+            digest + canonical_extension(name))
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+
+image_storage = ContentAddressedStorage()
+
+
+class ThumbnailStorage(FileSystemStorage):
+    """Хранилище миниатюр sorl.
+
+    Имя миниатюры однозначно задаёт её содержимое, поэтому файл с занятым
+    именем не получает суффикс, а заменяется: пул потоков и команда
+    thumbnails, создавшие одну миниатюру, оставляют один файл. Файл пишется
+    во временный рядом и переименовывается, так что недописанным его
+    не видно.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return name
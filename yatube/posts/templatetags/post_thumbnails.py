@@ -0,0 +1,37 @@
+from collections import namedtuple
+
+from django import template
+from sorl.thumbnail import default
+
+from posts.thumbnails import FALLBACK, image_variants
+
+register = template.Library()
+
+Picture = namedtuple('Picture', 'fallback srcset ready')
+
+
+@register.simple_tag(takes_context=True)
+def post_picture(context, image):
+    """Варианты картинки поста для <picture>: JPEG для src и строка srcset
+    из WebP разной ширины.
+
+    Миниатюры берутся из карты thumbnails, которую вью заполняет для всей
+    страницы сразу; без карты они читаются из KVStore здесь же. Пока
+    миниатюр нет, вместо JPEG отдаётся оригинал, а в srcset попадают только
+    готовые WebP; ready становится True, когда готовы все варианты.
+    """
+    if not image:
+        return None
+    variants = image_variants(image.instance.image_width)
+    thumbnails = context.get('thumbnails')
+    if thumbnails is None:
+        thumbnails = default.backend.get_thumbnails([(image, variants)])
+    srcset = ', '.join(
+        f'{thumbnails[image.name, variant.key].url} {variant.width}w'
+        for variant in variants[1:]
+        if (image.name, variant.key) in thumbnails
+    )
+    ready = all((image.name, variant.key) in thumbnails
+                for variant in variants)
+    return Picture(thumbnails.get((image.name, FALLBACK.key), image), srcset,
+                   ready)
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+
+class AdminChangeListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.admin, group=self.group,
+                                       text=f'Пост {i}')
+            Comment.objects.create(post=post, author=self.admin,
+                                   text=f'Комментарий {i}')
+
+    def queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.admin_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списков в админке не зависит от числа строк."""
+        urls = [
+            reverse('admin:posts_post_changelist'),
+            reverse('admin:posts_comment_changelist'),
+            reverse('admin:posts_follow_changelist'),
+        ]
+        self.add_posts(2)
+        few = [self.queries(url) for url in urls]
+        self.add_posts(20)
+        self.assertEqual([self.queries(url) for url in urls], few)
+
+    def test_no_distinct_dates(self):
+        """Списки не перебирают даты всей таблицы."""
+        self.add_posts(2)
+        for url in (reverse('admin:posts_post_changelist'),
+                    reverse('admin:posts_comment_changelist')):
+            with CaptureQueriesContext(connection) as context:
+                self.admin_client.get(url)
+            self.assertFalse([query for query in context.captured_queries
+                              if 'DISTINCT' in query['sql']])
+
+    def test_count_is_cached(self):
+        """Повторный просмотр списка не считает строки заново."""
+        self.add_posts(2)
+        url = reverse('admin:posts_post_changelist')
+        self.admin_client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.admin_client.get(url)
+        sql = [query['sql'] for query in context.captured_queries]
+        self.assertFalse([query for query in sql if 'COUNT(' in query])
+        self.assertEqual(
+            len([query for query in sql if 'FROM "posts_group"' in query]),
+            1)
+        self.assertEqual(response.context['cl'].result_count, 2)
@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from .. import autocomplete
+from ..autocomplete import AutocompleteIndex, index
+from ..models import Group, User
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Русская литература',
+            slug='literature',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def suggest(self, query):
+        response = self.guest_client.get(
+            reverse('posts:autocomplete'), {'q': query})
+        return [result['label'] for result in response.json()['results']]
+
+    def test_prefix(self):
+        """Подсказки находятся по началу логина, имени, названия и slug."""
+        user = 'Лев Толстой (@leo)'
+        group = 'Русская литература'
+        cases = {
+            'le': [user],
+            '@le': [user],
+            'тол': [user],
+            'лит': [group],
+            'LITER': [group],
+            'русская лит': [group],
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.suggest(query), expected)
+
+    def test_typo(self):
+        """Запрос с опечаткой находит похожие имена по триграммам."""
+        self.assertEqual(self.suggest('толстый'), ['Лев Толстой (@leo)'])
+        self.assertEqual(self.suggest('литиратура'), ['Русская литература'])
+        self.assertEqual(self.suggest('zzz'), [])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_no_queries_when_warm(self):
+        """Прогретый индекс отвечает без запросов к базе."""
+        self.suggest('le')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('лев'), ['Лев Толстой (@leo)'])
+
+    def test_incremental_update(self):
+        """Изменения пользователей и групп попадают в индекс без
+        перестроения."""
+        self.suggest('le')
+        with self.assertNumQueries(0):
+            index.ensure_fresh()
+        self.user.first_name = 'Лёва'
+        self.user.save()
+        group = Group.objects.create(title='Лирика', slug='lyrics')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('лев'), ['Лёва Толстой (@leo)'])
+            self.assertEqual(self.suggest('ли'),
+                             ['Лирика', 'Русская литература'])
+        group.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('ли'), ['Русская литература'])
+
+    def test_other_process_applies_changes(self):
+        """Индекс другого процесса получает изменения из журнала в кэше
+        без запросов к базе."""
+        other = AutocompleteIndex()
+        other.ensure_fresh()
+        self.user.first_name = 'Лёва'
+        self.user.save()
+        Group.objects.create(title='Лирика', slug='lyrics')
+        with self.assertNumQueries(0):
+            other.ensure_fresh()
+        self.assertEqual([entry.label for entry in other.search('лев')],
+                         ['Лёва Толстой (@leo)'])
+        self.assertEqual([entry.label for entry in other.search('лир')],
+                         ['Лирика'])
+
+    def test_lost_changes_rebuild(self):
+        """Пропуск в журнале или его потеря перестраивает индекс."""
+        self.suggest('le')
+        Group.objects.bulk_create([Group(title='Поэзия', slug='poetry')])
+        self.assertEqual(self.suggest('поэ'), [])
+        autocomplete.invalidate()
+        self.assertEqual(self.suggest('поэ'), ['Поэзия'])
+        Group.objects.bulk_create([Group(title='Проза', slug='prose')])
+        cache.clear()
+        self.assertEqual(self.suggest('про'), ['Проза'])
@@ -0,0 +1,72 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'generate_data', users=10, groups=2, posts=50, comments=30,
+            follows=20, images=1, image_share=0.5, stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate_data(self):
+        """generate_data создаёт данные заданного размера и счётчики."""
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        for stats in AuthorStats.objects.all():
+            with self.subTest(user=stats.user_id):
+                self.assertEqual(
+                    stats.posts_count,
+                    Post.objects.filter(author=stats.user_id).count(),
+                )
+
+    def test_benchmark_reports_percentiles(self):
+        """benchmark выдаёт задержки и число запросов по сценариям."""
+        out = StringIO()
+        call_command('benchmark', requests=3, warmup=0, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['posts'], 50)
+        for name, result in results['scenarios'].items():
+            with self.subTest(scenario=name):
+                self.assertEqual(result['errors'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['queries_per_request'], 0)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=60)
+    def test_benchmark_disables_page_cache(self):
+        """benchmark замеряет страницы без кэша страниц, пока его не
+        попросят оставить, и указывает настройку в результатах."""
+        for page_cache, timeout in ((False, 0), (True, 60)):
+            out = StringIO()
+            call_command('benchmark', requests=3, warmup=1,
+                         scenarios=['index'], page_cache=page_cache,
+                         seed=1, stdout=out)
+            results = json.loads(out.getvalue())
+            with self.subTest(page_cache=page_cache):
+                self.assertEqual(results['page_cache_timeout'], timeout)
+                if not page_cache:
+                    self.assertGreaterEqual(
+                        results['scenarios']['index']['queries_per_request'],
+                        1)
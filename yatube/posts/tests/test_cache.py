@@ -0,0 +1,256 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import dateformat
+
+from core.cache import version_key
+from ..models import Comment, Follow, Group, Post, User
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=60)
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.another_group = Group.objects.create(
+            title='Другая группа',
+            slug='another-slug',
+            description='Другое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый текст',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_page_is_served_from_cache(self):
+        """Повторный анонимный запрос не обращается к базе."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('about:author'),
+        ]
+        for page in pages:
+            with self.subTest(page=page):
+                content = self.guest_client.get(page).content
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(page)
+                self.assertEqual(response.content, content)
+
+    def test_authorized_page_is_not_cached(self):
+        """Страницы для авторизованных пользователей не кэшируются."""
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+
+    def test_new_post_invalidates_its_pages_only(self):
+        """Новый пост сбрасывает главную, страницу своей группы и профиль
+        автора, но не страницы других групп."""
+        pages = {
+            reverse('posts:index'): True,
+            reverse('posts:group_list',
+                    kwargs={'slug': self.group.slug}): True,
+            reverse('posts:profile', kwargs={'username': self.user}): True,
+            reverse('posts:group_list',
+                    kwargs={'slug': self.another_group.slug}): False,
+        }
+        for page in pages:
+            self.guest_client.get(page)
+        Post.objects.create(author=self.user, text='Новый пост',
+                            group=self.group)
+        for page, invalidated in pages.items():
+            with self.subTest(page=page):
+                response = self.guest_client.get(page)
+                self.assertEqual(response.context is not None, invalidated)
+
+    def test_comment_invalidates_post_detail(self):
+        """Новый комментарий сбрасывает страницу поста."""
+        page = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(page)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Новый комментарий')
+        response = self.guest_client.get(page)
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_new_post_updates_author_post_pages(self):
+        """Новый и удалённый пост меняют число постов автора на страницах
+        других его постов."""
+        page = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(page)
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        response = self.guest_client.get(page)
+        self.assertEqual(response.context['posts_count'], 2)
+        post.delete()
+        response = self.guest_client.get(page)
+        self.assertEqual(response.context['posts_count'], 1)
+
+    def test_new_post_keeps_other_post_versions(self):
+        """Новый пост меняет версию области автора, а не страниц каждого
+        его поста."""
+        key = version_key(f'post:{self.post.pk}')
+        self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        version = cache.get(key)
+        Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(cache.get(key), version)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый текст')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def card_key(self, post):
+        return make_template_fragment_key(
+            'post_card',
+            [post.pk, dateformat.format(post.updated, 'U.u'), ''])
+
+    def test_post_card_is_cached_until_post_changes(self):
+        """Карточка поста берётся из кэша, пока пост не изменён."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.authorized_client.get(url)
+        self.assertIn(self.post.text, cache.get(self.card_key(self.post)))
+        Post.objects.filter(pk=self.post.pk).update(text='Скрытая правка')
+        self.assertNotContains(self.authorized_client.get(url),
+                               'Скрытая правка')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertContains(self.authorized_client.get(url), 'Новый текст')
+
+    def test_author_and_group_renames_reach_card(self):
+        """Новое имя автора и название группы сразу видны в карточке."""
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        url = reverse('posts:group_list', kwargs={'slug': group.slug})
+        self.authorized_client.get(url)
+        self.user.first_name, self.user.last_name = 'Новое', 'Имя'
+        self.user.save()
+        self.assertContains(self.authorized_client.get(url), 'Новое Имя')
+        group.title = 'Переименованная группа'
+        group.save()
+        self.assertContains(self.authorized_client.get(url),
+                            'все записи группы Переименованная группа')
+
+    def test_password_change_keeps_cards(self):
+        """Смена пароля и активности автора не обновляет его посты."""
+        updated = Post.objects.get(pk=self.post.pk).updated
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-password')
+        user.save()
+        user.is_active = False
+        user.save()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(author=cls.author,
+                                       text='Тестовый текст')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse('posts:profile', kwargs={'username': self.author})
+
+    def test_unchanged_page_is_not_modified(self):
+        """Неизменившаяся страница отдаёт 304 без запросов к базе."""
+        etag = self.guest_client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.url,
+                                             HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_last_modified_for_anonymous(self):
+        """Анонимный посетитель получает 304 по If-Modified-Since."""
+        last_modified = self.guest_client.get(self.url)['Last-Modified']
+        response = self.guest_client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_changes_reset_etag(self):
+        """Новый пост и подписка меняют ETag страницы."""
+        changes = [
+            lambda: Post.objects.create(author=self.author, text='Новый'),
+            lambda: Follow.objects.create(user=self.user, author=self.author),
+        ]
+        for change in changes:
+            etag = self.authorized_client.get(self.url)['ETag']
+            change()
+            response = self.authorized_client.get(self.url,
+                                                  HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_differs_between_users(self):
+        """Разные пользователи получают разные ETag одной страницы."""
+        self.assertNotEqual(self.guest_client.get(self.url)['ETag'],
+                            self.authorized_client.get(self.url)['ETag'])
+
+    def test_post_detail_etag_follows_author_posts(self):
+        """Страница поста отдаёт 304, пока у автора не появится пост."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(url)
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, text='Новый')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_renames_reset_etags(self):
+        """Переименование группы и автора меняет ETag профиля автора и
+        страницы его поста."""
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        urls = [
+            self.url,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        renames = [
+            lambda: Group.objects.filter(pk=group.pk).first().save(),
+            lambda: setattr(group, 'title', 'Новая группа') or group.save(),
+            lambda: setattr(self.author, 'first_name', 'Имя')
+            or self.author.save(),
+        ]
+        for url in urls:
+            self.authorized_client.get(url)
+        for rename, changed in zip(renames, (False, True, True)):
+            etags = [self.authorized_client.get(url)['ETag'] for url in urls]
+            rename()
+            for url, etag in zip(urls, etags):
+                with self.subTest(url=url, changed=changed):
+                    response = self.authorized_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(
+                        response.status_code,
+                        HTTPStatus.OK if changed else HTTPStatus.NOT_MODIFIED)
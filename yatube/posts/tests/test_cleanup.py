@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .. import cleanup, thumbnails
+from ..models import Post, User
+from ..storage import image_storage
+from .utils import small_gif
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+DAY = 60 * 60 * 24
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class CleanMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        post = Post.objects.create(
+            author=self.user, text='Пост с картинкой',
+            image=SimpleUploadedFile(name, small_gif(name), 'image/gif'))
+        thumbnails.generate(post.image.name, post.image_width)
+        return post
+
+    def files(self):
+        return set(cleanup.walk(default_storage))
+
+    def age(self, days=1):
+        past = time.time() - days * DAY
+        for name in self.files():
+            os.utime(default_storage.path(name), (past, past))
+
+    def test_orphans_removed(self):
+        """Удаляются картинка удалённого поста, её миниатюры и записи
+        KVStore, а также миниатюры прежнего размера живой картинки."""
+        post = self.create_post('live.gif')
+        live = self.files()
+        deleted = self.create_post('deleted.gif')
+        name = deleted.image.name
+        deleted.delete()
+        stale = get_thumbnail(post.image, '100x100')
+        self.age()
+        result = cleanup.collect(rate=0)
+        self.assertTrue(result['done'])
+        self.assertEqual(self.files(), live)
+        self.assertGreater(result['freed'], 0)
+        self.assertIsNone(default.kvstore.get(ImageFile(name, image_storage)))
+        self.assertIsNone(default.kvstore.get(stale))
+        self.assertIsNotNone(default.kvstore.get(ImageFile(post.image)))
+
+    def test_fresh_files_kept(self):
+        """Файлы моложе grace и файлы в режиме dry_run не удаляются."""
+        self.create_post('deleted.gif').delete()
+        files = self.files()
+        self.assertEqual(cleanup.collect(rate=0)['removed'], 0)
+        self.age()
+        result = cleanup.collect(rate=0, dry_run=True)
+        self.assertEqual(result['removed'], len(files))
+        self.assertEqual(self.files(), files)
+
+    def test_resumes_where_stopped(self):
+        """Запуск, исчерпавший время, продолжается со следующего файла."""
+        self.create_post('deleted.gif').delete()
+        self.age()
+        files = sorted(self.files())
+        # Отсчёт срока и проверки перед первыми двумя файлами укладываются
+        # в бюджет, перед третьим — нет.
+        clock = mock.patch('posts.cleanup.time.monotonic',
+                           side_effect=[0, 0, 0, 100])
+        with clock:
+            result = cleanup.collect(budget=10, rate=0)
+        self.assertEqual(result['checked'], 2)
+        self.assertFalse(result['done'])
+        self.assertEqual(sorted(self.files()), files[2:])
+        result = cleanup.collect(rate=0)
+        self.assertEqual(result['checked'], len(files) - 2)
+        self.assertTrue(result['done'])
+        self.assertEqual(self.files(), set())
+
+    def test_slow_marking_not_counted(self):
+        """Время пометки живых файлов не входит в бюджет обхода."""
+        self.create_post('deleted.gif').delete()
+        self.age()
+        live_files = cleanup.live_files
+        now = [0]
+
+        def slow_live_files():
+            now[0] += 100
+            return live_files()
+
+        with mock.patch('posts.cleanup.time.monotonic', lambda: now[0]), \
+                mock.patch('posts.cleanup.live_files', slow_live_files):
+            result = cleanup.collect(budget=10, rate=0)
+        self.assertTrue(result['done'])
+        self.assertEqual(self.files(), set())
+
+    def test_command(self):
+        """Команда сообщает, сколько файлов проверено и удалено."""
+        self.create_post('deleted.gif').delete()
+        self.age()
+        out = StringIO()
+        call_command('clean_media', '--rate', '0', stdout=out)
+        self.assertIn('Обход завершён', out.getvalue())
+        self.assertEqual(self.files(), set())
@@ -0,0 +1,59 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+
+
+@mock.patch('posts.views.COMMENTS_PER_PAGE', 3)
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(author=cls.author,
+                                       text='Тестовый текст')
+        for i in range(7):
+            commentator = User.objects.create_user(username=f'reader_{i}')
+            Comment.objects.create(post=cls.post, author=commentator,
+                                   text=f'Комментарий №{i}')
+        cls.comments = list(
+            cls.post.comments.order_by('created', 'pk'))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_comments_are_fetched_by_cursor(self):
+        """Комментарии выдаются порциями, следующую отдаёт фрагмент."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        fetched = list(response.context['comments'])
+        cursor = response.context['next_cursor']
+        while cursor:
+            response = self.guest_client.get(
+                reverse('posts:post_comments',
+                        kwargs={'post_id': self.post.pk}),
+                {'after': cursor},
+            )
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            fetched += response.context['comments']
+            cursor = response.context['next_cursor']
+        self.assertEqual(fetched, self.comments)
+
+    def test_comment_authors_are_joined(self):
+        """Авторы комментариев не запрашиваются по одному."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        with self.assertNumQueries(2):
+            self.guest_client.get(url)
+
+    def test_invalid_cursor(self):
+        """Неверный курсор отдаёт 404."""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'after': 'unknown'},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
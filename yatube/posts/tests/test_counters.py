@@ -0,0 +1,60 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Post, User
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.author = User.objects.create_user(username='test_author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании и удалении постов, подписок и
+        комментариев."""
+        post = Post.objects.create(author=self.author, text='Тестовый текст')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_repair_counters(self):
+        """Команда repair_counters чинит разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.author, text='Тестовый текст')
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Пост без сигналов')
+        ])
+        AuthorStats.objects.filter(user=self.user).delete()
+        Post.objects.update(comments_count=0)
+        call_command('repair_counters', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from .. import feeds
+from ..models import FeedItem, Follow, Post, User
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.author = User.objects.create_user(username='test_author')
+        cls.old_post = Post.objects.create(text='Старый пост',
+                                           author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_trims_feed(self):
+        """Подписка докладывает в ленту посты автора, отписка убирает."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.feed(), [self.old_post])
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertFalse(FeedItem.objects.filter(user=self.user).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(
+            FeedItem.objects.filter(user=self.user, post=post).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @mock.patch('posts.feeds.FEED_PUSH_LIMIT', 0)
+    def test_popular_author_is_pulled_on_read(self):
+        """Посты автора с множеством подписчиков не раскладываются при
+        публикации, а забираются при чтении ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.feed()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @mock.patch('posts.feeds.FEED_PUSH_LIMIT', 0)
+    def test_pull_keeps_index_without_new_posts(self):
+        """Чтение ленты без новых постов не сбрасывает её индекс."""
+        self.feed()
+        Follow.objects.create(user=self.user, author=self.author)
+        self.feed()
+        with mock.patch('posts.feeds.drop_indexes') as drop_indexes:
+            cache.delete(f'feed-pulled-at:{self.user.pk}')
+            self.feed()
+            self.feed()
+        drop_indexes.assert_not_called()
+
+
+@override_settings(FOLLOW_FEED_STRATEGY='pull')
+class MergedFollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.authors = [
+            User.objects.create_user(username=f'test_author_{i}')
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+        for i in range(12):
+            Post.objects.create(text=f'Пост №{i}',
+                                author=cls.authors[i % 3])
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_is_merged_from_author_timelines(self):
+        """Лента собирается слиянием лент авторов без записей ленты."""
+        self.assertFalse(FeedItem.objects.exists())
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), expected[:10])
+        response = self.authorized_client.get(
+            reverse('posts:follow_index') + '?page=2')
+        self.assertEqual(list(response.context['page_obj']), expected[10:])
+
+    @mock.patch('posts.feeds.TIMELINE_LENGTH', 3)
+    def test_cold_timelines_in_one_query(self):
+        """Ленты всех авторов без кэша читаются одним запросом и обрезаются
+        по длине ленты."""
+        authors = [author.pk for author in self.authors]
+        with self.assertNumQueries(1):
+            timelines = feeds.author_timelines(authors)
+        expected = {
+            author.pk: list(author.posts.order_by(
+                '-pub_date', '-pk').values_list('pub_date', 'pk')[:3])
+            for author in self.authors
+        }
+        self.assertCountEqual(timelines, expected.values())
+        with self.assertNumQueries(0):
+            feeds.author_timelines(authors)
+
+    def test_new_post_resets_author_timeline(self):
+        """Новый пост автора сразу попадает в собранную ленту."""
+        self.authorized_client.get(reverse('posts:follow_index'))
+        post = Post.objects.create(text='Новый пост', author=self.authors[0])
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
@@ -135,8 +135,9 @@ class PostFormTests(TestCase):
         last_created_post = Post.objects.latest('pub_date')
         self.assertEqual(last_created_post.text, form_data['text'])
         self.assertEqual(last_created_post.group.pk, form_data['group'])
-        self.assertEqual(last_created_post.image,
-                         f'posts/{form_data["image"]}')
+        self.assertRegex(
+            last_created_post.image.name,
+            r'^posts/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.gif$')
 
     def test_authorized_can_leave_comments(self):
         """Авторизованный пользователь может оставлять комментарии."""
@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..images import MAX_SIDE
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+EXIF_ORIENTATION = 0x0112
+ROTATED_90 = 6
+
+
+def upload(name, size, format_, **params):
+    content = BytesIO()
+    Image.new('RGB', size, 'red').save(content, format_, **params)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, image):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост с картинкой', 'image': image},
+        )
+        return Post.objects.latest('pk')
+
+    def test_photo_is_rotated_and_downscaled(self):
+        """Фото поворачивается по EXIF, уменьшается и теряет EXIF,
+        а его размер сохраняется в посте."""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = ROTATED_90
+        post = self.create(upload('photo.jpeg', (4000, 3000), 'JPEG',
+                                  exif=exif.tobytes()))
+        self.assertEqual((post.image_width, post.image_height),
+                         (MAX_SIDE * 3 // 4, MAX_SIDE))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size,
+                             (post.image_width, post.image_height))
+            self.assertNotIn('exif', image.info)
+
+    def test_small_image_keeps_format_and_size(self):
+        """Небольшая картинка сохраняет размер и формат."""
+        post = self.create(upload('small.png', (300, 200), 'PNG'))
+        self.assertTrue(post.image.name.endswith('.png'))
+        self.assertEqual((post.image_width, post.image_height), (300, 200))
+
+    def test_size_for_image_set_outside_form(self):
+        """Размер картинки, заданной в обход формы, читается при
+        сохранении, а без картинки сбрасывается."""
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=upload('direct.png', (640, 480), 'PNG'))
+        self.assertEqual((post.image_width, post.image_height), (640, 480))
+        post.image = ''
+        post.save()
+        self.assertEqual((post.image_width, post.image_height),
+                         (None, None))
+        post.image = 'posts/missing.png'
+        post.save()
+        self.assertIsNone(post.image_width)
@@ -0,0 +1,75 @@
+import gzip
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+class ImportExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test_user')
+        self.author = User.objects.create_user(username='test_author')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(author=self.author, group=self.group,
+                                        text='Тестовый текст')
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Тестовый комментарий')
+        Follow.objects.create(user=self.user, author=self.author)
+        handle, self.path = tempfile.mkstemp(suffix='.ndjson.gz')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_export_import_roundtrip(self):
+        """Выгрузка загружается поверх других данных со сдвигом id и
+        пересчётом счётчиков."""
+        call_command('export_data', self.path, stderr=StringIO())
+        pub_date = self.post.pub_date
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        other = User.objects.create_user(username='other_user')
+        Post.objects.create(author=other, text='Другой пост')
+
+        call_command('import_data', self.path, stdout=StringIO())
+
+        post = Post.objects.get(text='Тестовый текст')
+        self.assertNotEqual(post.pk, self.post.pk)
+        self.assertEqual(post.author.username, 'test_author')
+        self.assertEqual(post.group.slug, 'test-slug')
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.comments.get().author.username, 'test_user')
+        self.assertTrue(Follow.objects.filter(
+            user__username='test_user', author=post.author).exists())
+        self.assertEqual(
+            AuthorStats.objects.get(user=post.author).followers_count, 1)
+        new_user = User.objects.create_user(username='new_user')
+        self.assertGreater(new_user.pk, post.author.pk)
+
+    def test_failed_import_repairs_loaded_part(self):
+        """Прерванная загрузка пересчитывает счётчики уже загруженных
+        объектов, очищает кэш и подсказывает, что удалить."""
+        call_command('export_data', self.path, stderr=StringIO())
+        with gzip.open(self.path, 'at') as stream:
+            stream.write('{"model": "posts.unknown", "pk": 1}\n')
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        other = User.objects.create_user(username='other_user')
+        cache.set('stale-page', 'old')
+        stderr = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('import_data', self.path, stdout=StringIO(),
+                         stderr=stderr)
+        author = User.objects.get(username='test_author')
+        self.assertEqual(AuthorStats.objects.get(user=author).posts_count, 1)
+        self.assertIsNone(cache.get('stale-page'))
+        self.assertIn(f'auth.user > {other.pk}', stderr.getvalue())
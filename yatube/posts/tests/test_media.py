@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from core.media import IMMUTABLE_MAX_AGE, MEDIA_MAX_AGE
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 4
+HASHED = 'cache/ab/cd/abcd' + '0' * 28 + '.jpg'
+PLAIN = 'posts/leo2.jpg'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in (HASHED, PLAIN):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, name, **headers):
+        return self.client.get(settings.MEDIA_URL + name, **headers)
+
+    def test_whole_file(self):
+        """Файл отдаётся потоком с типом, длиной и заголовками кэша."""
+        response = self.get(HASHED)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+    def test_cache_control(self):
+        """Файлы с хешем в имени кэшируются навсегда, остальные — на день."""
+        self.assertEqual(self.get(HASHED)['Cache-Control'],
+                         f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+        self.assertEqual(self.get(PLAIN)['Cache-Control'],
+                         f'public, max-age={MEDIA_MAX_AGE}')
+
+    def test_ranges(self):
+        """Запрос части файла получает 206 и только эти байты."""
+        size = len(CONTENT)
+        cases = (
+            ('bytes=10-19', 10, 19),
+            ('bytes=1000-', 1000, size - 1),
+            ('bytes=-24', size - 24, size - 1),
+            ('bytes=1020-5000', 1020, size - 1),
+        )
+        for header, start, end in cases:
+            with self.subTest(header=header):
+                response = self.get(HASHED, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'],
+                                 f'bytes {start}-{end}/{size}')
+                self.assertEqual(response['Content-Length'],
+                                 str(end - start + 1))
+                self.assertEqual(b''.join(response.streaming_content),
+                                 CONTENT[start:end + 1])
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        """Диапазон за концом файла получает 416, непонятный и
+        устаревший по If-Range — весь файл."""
+        response = self.get(HASHED, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+        for headers in ({'HTTP_RANGE': 'bytes=0-1,5-6'},
+                        {'HTTP_RANGE': 'items=0-1'},
+                        {'HTTP_RANGE': 'bytes=0-1',
+                         'HTTP_IF_RANGE': '"stale"'}):
+            with self.subTest(headers=headers):
+                self.assertEqual(self.get(HASHED, **headers).status_code, 200)
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag или датой изменения получает 304."""
+        response = self.get(HASHED)
+        self.assertEqual(
+            self.get(HASHED, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+            304)
+        self.assertEqual(self.get(
+            HASHED, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        ).status_code, 304)
+
+    def test_missing_and_outside_files(self):
+        """Отсутствующие файлы, каталоги и файлы вне MEDIA_ROOT — 404."""
+        for name in ('posts/missing.jpg', 'posts', '../manage.py'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+
+    def test_only_safe_methods(self):
+        """Медиа отдаются только на GET и HEAD."""
+        self.assertEqual(self.client.head(
+            settings.MEDIA_URL + HASHED).status_code, 200)
+        self.assertEqual(self.client.post(
+            settings.MEDIA_URL + HASHED).status_code, 405)
+
+    @override_settings(MEDIA_OFFLOAD='x-accel-redirect')
+    def test_accel_redirect(self):
+        """В режиме X-Accel-Redirect файл отдаёт nginx."""
+        response = self.get(HASHED)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         settings.MEDIA_ACCEL_PREFIX + HASHED)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_OFFLOAD='x-sendfile')
+    def test_sendfile(self):
+        """В режиме X-Sendfile передаётся полный путь к файлу."""
+        response = self.get(PLAIN)
+        self.assertEqual(response['X-Sendfile'],
+                         os.path.join(TEMP_MEDIA_ROOT, PLAIN))
@@ -0,0 +1,145 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import TestCase
+
+from core.templatetags.pagination import elided_page_range
+from ..models import Post, User
+from ..paginator import (
+    SEEK_INDEX_STRIDE, FeedPaginator, SeekPaginator, index_key)
+
+PER_PAGE = 4
+
+
+class SeekPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.posts_created = SEEK_INDEX_STRIDE * 2 + 1
+        Post.objects.bulk_create(
+            Post(text=f'Пост №{i}', author=cls.user)
+            for i in range(cls.posts_created)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post_list = Post.objects.all()
+
+    def test_pages_match_offset_pagination(self):
+        """Страницы, найденные по курсору, совпадают со срезами ленты."""
+        expected = list(self.post_list.order_by('-pub_date', '-pk'))
+        paginator = SeekPaginator(self.post_list, PER_PAGE, 'test')
+        self.assertEqual(paginator.count, self.posts_created)
+        for number in paginator.page_range:
+            with self.subTest(number=number):
+                bottom = (number - 1) * PER_PAGE
+                self.assertEqual(
+                    list(paginator.page(number)),
+                    expected[bottom:bottom + PER_PAGE],
+                )
+
+    def test_deep_page_does_not_count(self):
+        """Глубокая страница с готовым индексом стоит одного запроса."""
+        SeekPaginator(self.post_list, PER_PAGE, 'test').index
+        paginator = SeekPaginator(self.post_list, PER_PAGE, 'test')
+        with self.assertNumQueries(1):
+            page = paginator.get_page(paginator.num_pages)
+        self.assertEqual(len(page), 1)
+
+    def test_index_built_without_walking_feed(self):
+        """Индекс строится одним запросом, какой бы длинной ни была
+        лента."""
+        paginator = SeekPaginator(self.post_list, PER_PAGE, 'test')
+        with self.assertNumQueries(1):
+            index = paginator.index
+        self.assertEqual(index['count'], self.posts_created)
+        expected = list(self.post_list.order_by(
+            '-pub_date', '-pk').values_list('pub_date', 'pk'))
+        self.assertEqual(index['checkpoints'],
+                         expected[::SEEK_INDEX_STRIDE])
+
+    def test_new_posts_reset_index(self):
+        """После новых постов каждый пост ленты попадает ровно на одну
+        страницу."""
+        FeedPaginator(self.post_list, PER_PAGE, 'index').index
+        for i in range(3):
+            Post.objects.create(text=f'Новый пост №{i}', author=self.user)
+        paginator = FeedPaginator(self.post_list, PER_PAGE, 'index')
+        shown = [post.pk for number in paginator.page_range
+                 for post in paginator.get_page(number)]
+        self.assertEqual(sorted(shown), sorted(
+            self.post_list.values_list('pk', flat=True)))
+
+    def test_new_posts_shift_index(self):
+        """Новые посты сдвигают контрольные точки, а не сбрасывают индекс:
+        глубокая страница снова стоит одного запроса."""
+        FeedPaginator(self.post_list, PER_PAGE, 'index').count
+        for i in range(3):
+            Post.objects.create(text=f'Новый пост №{i}', author=self.user)
+        expected = list(self.post_list.order_by('-pub_date', '-pk'))
+        paginator = FeedPaginator(self.post_list, PER_PAGE, 'index')
+        with self.assertNumQueries(1):
+            page = paginator.get_page(paginator.num_pages - 1)
+        bottom = (paginator.num_pages - 2) * PER_PAGE
+        self.assertEqual(list(page), expected[bottom:bottom + PER_PAGE])
+
+    def test_concurrent_build_waits_for_index(self):
+        """Пока индекс строит другой запрос, пагинатор ждёт его, а не
+        строит сам."""
+        index = SeekPaginator(self.post_list, PER_PAGE, 'test').index
+        cache.delete(index_key('test'))
+        cache.add(f'{index_key("test")}:lock', True)
+        paginator = SeekPaginator(self.post_list, PER_PAGE, 'test')
+        with mock.patch('posts.paginator.time.sleep', side_effect=lambda _: (
+                cache.set(index_key('test'), index))):
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.index, index)
+
+    def test_stale_index_is_rebuilt(self):
+        """Устаревший индекс перестраивается, а не искажает страницу."""
+        SeekPaginator(self.post_list, PER_PAGE, 'test').index
+        self.post_list.order_by('pub_date', 'pk').first().delete()
+        paginator = SeekPaginator(self.post_list, PER_PAGE, 'test')
+        last_page = paginator.get_page(1000)
+        self.assertEqual(paginator.count, self.posts_created - 1)
+        self.assertEqual(len(last_page), PER_PAGE)
+
+
+class FeedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        Post.objects.create(text='Первый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.key = f'profile:{self.user.pk}'
+
+    def test_count_follows_created_and_deleted_posts(self):
+        """Счётчик ленты меняется при создании и удалении постов без
+        COUNT(*)."""
+        post_list = self.user.posts.all()
+        self.assertEqual(FeedPaginator(post_list, 10, self.key).count, 1)
+        post = Post.objects.create(text='Второй пост', author=self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(FeedPaginator(post_list, 10, self.key).count, 2)
+        post.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(FeedPaginator(post_list, 10, self.key).count, 1)
+
+    def test_elided_page_range(self):
+        """В навигации только края и окно вокруг текущей страницы."""
+        paginator = Paginator(range(1000), 10)
+        cases = {
+            1: [1, 2, 3, 4, None, 100],
+            6: [1, 2, 3, 4, 5, 6, 7, 8, 9, None, 100],
+            50: [1, None, 47, 48, 49, 50, 51, 52, 53, None, 100],
+            100: [1, None, 97, 98, 99, 100],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    elided_page_range(paginator.page(number)), expected)
@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from core.queries import QueryBudgetExceeded, QueryCounter
+from ..models import Comment, Follow, Group, Post, User
+from ..paginator import encode_cursor
+from .utils import small_gif
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        authors = [
+            User.objects.create_user(username=f'test_author_{i}')
+            for i in range(3)
+        ]
+        for author in authors:
+            Follow.objects.create(user=cls.user, author=author)
+        groups = [cls.group, Group.objects.create(title='Другая группа',
+                                                  slug='another-slug')]
+        # У половины постов картинки, миниатюр которых ещё нет: страницы
+        # показывают оригиналы и не создают миниатюры сами.
+        for i in range(12):
+            image = SimpleUploadedFile(
+                f'image_{i}.gif', small_gif(str(i)), 'image/gif'
+            ) if i % 2 else None
+            Post.objects.create(author=authors[i % 3], group=groups[i % 2],
+                                text=f'Пост №{i}', image=image)
+        cls.author = authors[0]
+        cls.post = Post.objects.filter(group=cls.group).first()
+        for author in authors:
+            Comment.objects.create(post=cls.post, author=author,
+                                   text='Комментарий')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_views_stay_within_budget(self):
+        """Вью укладываются в свои бюджеты запросов без N+1."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+            + f'?after={encode_cursor(self.post.comments.first())}',
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=пост',
+            reverse('posts:autocomplete') + '?q=te',
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+        ]
+        for client in (self.guest_client, self.authorized_client):
+            for page in pages:
+                with self.subTest(page=page):
+                    cache.clear()
+                    client.get(page)
+
+    def test_writes_stay_within_budget(self):
+        """Создание и правка поста и комментарий укладываются в бюджет."""
+        forms = [
+            (reverse('posts:post_create'),
+             {'text': 'Новый пост', 'group': self.group.pk}),
+            (reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+             {'text': 'Правка', 'group': ''}),
+            (reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+             {'text': 'Комментарий'}),
+        ]
+        for url, data in forms:
+            with self.subTest(url=url):
+                cache.clear()
+                self.authorized_client.post(url, data)
+
+    def test_budget_overrun_fails(self):
+        """Превышение бюджета вью поднимает исключение."""
+        with mock.patch('posts.views.index.query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.guest_client.get(reverse('posts:index'))
+
+    def test_repeated_queries_are_detected(self):
+        """Повторы запроса одной формы распознаются как N+1."""
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            for post in Post.objects.all():
+                post.author.username
+        self.assertEqual(len(counter.duplicates()), 1)
+
+    def test_following_flag_is_annotated(self):
+        """Флаг подписки на автора вычисляется в запросе страницы."""
+        pages = [
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertTrue(
+                    self.authorized_client.get(page).context['following'])
+                self.assertFalse(
+                    self.guest_client.get(page).context['following'])
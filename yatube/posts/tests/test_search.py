@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Ёжики бегут по <b>осеннему</b> лесу',
+        )
+        cls.another_post = Post.objects.create(author=cls.user,
+                                               text='Кот спит')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def search(self, query, page=None):
+        params = {'q': query}
+        if page:
+            params['page'] = page
+        return self.guest_client.get(reverse('posts:search'), params)
+
+    def found(self, query):
+        return list(self.search(query).context['page_obj'])
+
+    def test_search_finds_word_forms(self):
+        """Поиск не зависит от регистра, «ё» и окончания слова."""
+        for query in ('ежик', 'ЁЖИКИ', 'осенн лес'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [self.post])
+        self.assertEqual(self.found('ежик кот'), [])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения в сниппете подсвечены, HTML из текста экранирован."""
+        response = self.search('лесу')
+        self.assertContains(response, '<mark>лесу</mark>')
+        self.assertContains(response, '&lt;b&gt;осеннему&lt;/b&gt;')
+
+    def test_results_are_ranked(self):
+        """Более релевантные посты идут первыми."""
+        relevant = Post.objects.create(author=self.user,
+                                       text='Кот, кот и ещё раз кот')
+        self.assertEqual(self.found('кот'), [relevant, self.another_post])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении поста и при
+        переименовании группы."""
+        post = Post.objects.create(author=self.user, group=self.group,
+                                   text='Старый текст')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.found('старый'), [])
+        self.assertEqual(self.found('новый'), [post])
+        self.group.title = 'Лесные жители'
+        self.group.save()
+        self.assertIn(post, self.found('жители'))
+        post.delete()
+        self.assertEqual(self.found('новый'), [])
+
+    def test_results_are_paginated(self):
+        """Результаты разбиты на страницы, ссылки сохраняют запрос."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'Заметка №{i}') for i in range(12)
+        ])
+        call_command('rebuild_search_index', chunk=5, stdout=StringIO())
+        response = self.search('заметка')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(response, '?q=%D0%B7%D0%B0%D0%BC%D0%B5%D1%82'
+                                      '%D0%BA%D0%B0&amp;page=2')
+        self.assertEqual(len(self.search('заметка', 2).context['page_obj']),
+                         2)
+
+    def test_rebuild_search_index(self):
+        """rebuild_search_index восстанавливает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_post_fts')
+        self.assertEqual(self.found('кот'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('кот'), [self.another_post])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по тому же индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'ежик'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.post])
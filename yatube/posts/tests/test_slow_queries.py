@@ -0,0 +1,61 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from core.queries import redact
+from ..models import Post, User
+
+
+class SlowQueryLogTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        Post.objects.create(author=cls.user, text='Тестовый текст')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_SAMPLE_RATE=1)
+    def test_slow_queries_are_logged_with_plan(self):
+        """Запросы дольше порога пишутся в JSON с планом и вью."""
+        with self.assertLogs('core.queries.slow') as logs:
+            response = self.guest_client.get(reverse('posts:index'),
+                                             HTTP_X_REQUEST_ID='test-id')
+        self.assertEqual(response['X-Request-ID'], 'test-id')
+        records = [json.loads(record.getMessage())
+                   for record in logs.records]
+        self.assertEqual({record['request_id'] for record in records},
+                         {'test-id'})
+        self.assertEqual({record['view'] for record in records},
+                         {'posts:index'})
+        self.assertTrue(all(record['plan'] for record in records))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_SAMPLE_RATE=1)
+    def test_params_not_logged(self):
+        """Значения параметров, например ключ сессии, в лог не пишутся."""
+        self.client.force_login(self.user)
+        session_key = self.client.session.session_key
+        with self.assertLogs('core.queries.slow') as logs:
+            self.client.get(reverse('posts:index'))
+        for record in logs.records:
+            self.assertNotIn(session_key, record.getMessage())
+            self.assertNotIn('params', json.loads(record.getMessage()))
+
+    def test_plan_redacted(self):
+        """Строковые параметры, подставленные в план, заменяются на %s."""
+        plan = ["Filter: (session_key = 'abc123') AND (id = 7)"]
+        self.assertEqual(
+            redact(plan, ['abc123', 7]),
+            ["Filter: (session_key = '%s') AND (id = 7)"])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_logged(self):
+        """Запросы вне выборки не замеряются."""
+        with mock.patch('core.queries.slow_logger') as slow_logger:
+            self.guest_client.get(reverse('posts:index'))
+        slow_logger.warning.assert_not_called()
@@ -0,0 +1,91 @@
+import gzip
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.static import IMMUTABLE_MAX_AGE, STATIC_MAX_AGE, compressors
+
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CSS = 'css/bootstrap.min.css'
+
+
+@override_settings(STATIC_ROOT=TEMP_STATIC_ROOT)
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.hashed = staticfiles_storage.stored_name(CSS)
+        with staticfiles_storage.open(CSS) as css:
+            cls.css = css.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_collected_with_hash_and_gzip(self):
+        """collectstatic сохраняет имя с хешем и сжатую копию."""
+        self.assertRegex(self.hashed,
+                         r'^css/bootstrap\.min\.[0-9a-f]{12}\.css$')
+        with staticfiles_storage.open(self.hashed + '.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), self.css)
+
+    def test_templates_use_hashed_names(self):
+        """Страницы ссылаются на статику по именам с хешем."""
+        response = self.client.get('/')
+        self.assertContains(response, staticfiles_storage.url(CSS))
+        self.assertIn(self.hashed, staticfiles_storage.url(CSS))
+
+    def test_hashed_file_compressed_and_immutable(self):
+        """Файл с хешем отдаётся сжатым и кэшируется навсегда."""
+        encoding, suffix, _ = next(compressors())
+        response = self.client.get(staticfiles_storage.url(CSS),
+                                   HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Content-Encoding'], encoding)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'],
+                         f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+        with staticfiles_storage.open(self.hashed + suffix) as compressed:
+            self.assertEqual(b''.join(response.streaming_content),
+                             compressed.read())
+
+    def test_uncompressed_without_accept_encoding(self):
+        """Без Accept-Encoding или с q=0 файл отдаётся несжатым."""
+        for header in ('', 'gzip;q=0, br;q=0'):
+            with self.subTest(header=header):
+                response = self.client.get(staticfiles_storage.url(CSS),
+                                           HTTP_ACCEPT_ENCODING=header)
+                self.assertNotIn('Content-Encoding', response)
+                self.assertEqual(b''.join(response.streaming_content),
+                                 self.css)
+
+    def test_unhashed_file_cached_briefly(self):
+        """Файл без хеша в имени кэшируется ненадолго."""
+        response = self.client.get(settings.STATIC_URL + CSS)
+        self.assertEqual(response['Cache-Control'],
+                         f'public, max-age={STATIC_MAX_AGE}')
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304."""
+        url = staticfiles_storage.url(CSS)
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_outside_static_root_not_served(self):
+        """Файлы вне STATIC_ROOT и несуществующие не отдаются."""
+        for path in ('../manage.py', 'css/missing.css'):
+            with self.subTest(path=path):
+                response = self.client.get(settings.STATIC_URL + path)
+                self.assertEqual(response.status_code, 404)
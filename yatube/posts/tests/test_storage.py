@@ -0,0 +1,136 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.cache import version_key
+from .. import thumbnails
+from ..models import Post, User
+from ..storage import ThumbnailStorage, image_storage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+DIGEST = hashlib.sha256(SMALL_GIF).hexdigest()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.user, text='Пост с картинкой',
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'))
+
+    def test_named_by_content_hash(self):
+        """Файл называется по хешу содержимого в каталоге по его началу."""
+        post = self.create_post('leo2.GIF')
+        self.assertEqual(
+            post.image.name,
+            f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.gif')
+        with post.image.open() as image:
+            self.assertEqual(image.read(), SMALL_GIF)
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые загрузки ссылаются на один файл и одни миниатюры."""
+        first = self.create_post('leo2.gif')
+        second = self.create_post('leo2.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [f'{DIGEST}.gif'])
+        thumbnails.generate(first.image.name, first.image_width)
+        thumbnails_map = thumbnails.prefetch([first, second])
+        self.assertEqual(len(thumbnails_map),
+                         len(thumbnails.image_variants(2)))
+
+    def test_identical_upload_refreshes_file(self):
+        """Повторная загрузка старого файла защищает его от clean_media."""
+        name = image_storage.save('posts/leo2.gif', ContentFile(SMALL_GIF))
+        path = image_storage.path(name)
+        os.utime(path, (0, 0))
+        image_storage.save('posts/leo2.gif', ContentFile(SMALL_GIF))
+        self.assertGreater(os.path.getmtime(path), 0)
+
+    def test_extension_spelling_ignored(self):
+        """Написание расширения не мешает узнать одинаковый файл."""
+        self.assertEqual(
+            image_storage.save('posts/a.jpeg', ContentFile(b'same')),
+            image_storage.save('posts/b.JPG', ContentFile(b'same')))
+
+    def test_dedupe_images(self):
+        """dedupe_images переносит старые файлы в хранилище по хешу
+        и сливает дубликаты."""
+        names = [default_storage.save(name, ContentFile(SMALL_GIF))
+                 for name in ('posts/leo2.gif', 'posts/leo2.gif')]
+        self.assertNotEqual(*names)
+        for name in names:
+            Post.objects.create(author=self.user, text='Пост', image=name)
+        Post.objects.create(author=self.user, text='Пост',
+                            image='posts/lost.gif')
+        out = StringIO()
+        call_command('dedupe_images', stdout=out)
+        self.assertEqual(
+            out.getvalue().strip(),
+            'Перенесено постов: 2, файлов: 1, нет файла: 1')
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(images, {
+            f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.gif',
+            'posts/lost.gif'})
+
+    def test_dedupe_images_refreshes_pages(self):
+        """dedupe_images обновляет карточки и версии страниц перенесённых
+        постов."""
+        name = default_storage.save('posts/leo3.gif', ContentFile(SMALL_GIF))
+        post = Post.objects.create(author=self.user, text='Пост', image=name)
+        cache.clear()
+        call_command('dedupe_images', stdout=StringIO())
+        self.assertGreater(Post.objects.get(pk=post.pk).updated, post.updated)
+        for scope in ('index', f'post:{post.pk}', f'profile:{self.user}'):
+            with self.subTest(scope=scope):
+                self.assertIsNotNone(cache.get(version_key(scope)))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailStorageTests(TestCase):
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_same_name_replaced(self):
+        """Повторная запись миниатюры заменяет файл, а не создаёт копию."""
+        storage = ThumbnailStorage()
+        name = 'cache/8c/57/thumbnail.jpg'
+        self.assertEqual(storage.save(name, ContentFile(b'first')), name)
+        self.assertEqual(storage.save(name, ContentFile(b'second')), name)
+        self.assertEqual(
+            storage.listdir('cache/8c/57'), ([], ['thumbnail.jpg']))
+        with storage.open(name) as thumbnail:
+            self.assertEqual(thumbnail.read(), b'second')
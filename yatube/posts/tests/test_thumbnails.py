@@ -0,0 +1,190 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+
+from .. import thumbnails
+from ..models import Post, User
+from .utils import small_gif
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, small_gif(name), 'image/gif'),
+        )
+
+    @mock.patch('posts.thumbnails.schedule')
+    def test_scheduled_on_image_change(self, schedule):
+        """Миниатюры заказываются для новой картинки, но не при правке
+        текста."""
+        post = self.create_post()
+        schedule.assert_called_once_with(post.image.name, 2)
+        post.text = 'Новый текст'
+        post.save()
+        schedule.assert_called_once()
+        post.image = SimpleUploadedFile(
+            'other.gif', small_gif('other.gif'), 'image/gif')
+        post.save()
+        schedule.assert_called_with(post.image.name, 2)
+        Post.objects.create(author=self.user, text='Без картинки')
+        self.assertEqual(schedule.call_count, 2)
+
+    def test_template_finds_generated_thumbnail(self):
+        """После генерации шаблон получает миниатюру без декодирования
+        исходной картинки."""
+        post = self.create_post()
+        self.assertEqual(thumbnails.generate(post.image.name),
+                         thumbnails.GENERATED)
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            for variant in thumbnails.VARIANTS:
+                self.assertTrue(get_thumbnail(
+                    post.image, variant.geometry, **variant.options
+                ).exists())
+        get_image.assert_not_called()
+
+    def test_variants_not_wider_than_image(self):
+        """WebP-варианты шире оригинала не создаются."""
+        self.assertEqual(thumbnails.image_variants(None), thumbnails.VARIANTS)
+        self.assertEqual(
+            [variant.key for variant in thumbnails.image_variants(800)],
+            ['jpeg', 'webp-480', 'webp-720'])
+        self.assertEqual(
+            [variant.key for variant in thumbnails.image_variants(100)],
+            ['jpeg', 'webp-480'])
+
+    def test_missing_file(self):
+        """Отсутствующий файл картинки не считается ошибкой."""
+        self.assertEqual(thumbnails.generate('posts/missing.gif'),
+                         thumbnails.MISSING)
+
+    def test_backfill_command(self):
+        """Команда создаёт миниатюры всех картинок и считает пропущенные
+        файлы."""
+        post = self.create_post()
+        Post.objects.create(author=self.user, text='Потерянная картинка',
+                            image='posts/lost.gif')
+        out = StringIO()
+        call_command('generate_thumbnails', workers=0, stdout=out)
+        self.assertEqual(out.getvalue().strip(),
+                         'Создано: 1, нет файла: 1, ошибок: 0')
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            get_thumbnail(post.image, thumbnails.FALLBACK.geometry,
+                          **thumbnails.FALLBACK.options)
+        get_image.assert_not_called()
+
+    def test_page_thumbnails_in_one_lookup(self):
+        """Миниатюры страницы читаются из KVStore одним запросом, и
+        шаблон берёт их из карты без новых запросов."""
+        posts = [self.create_post(f'image_{i}.gif') for i in range(3)]
+        call_command('generate_thumbnails', workers=0, stdout=StringIO())
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails_map = thumbnails.prefetch(posts)
+        # Картинка шириной 2 px получает JPEG и только самый узкий WebP.
+        self.assertEqual(len(thumbnails_map), 3 * 2)
+        template = Template(
+            '{% load post_thumbnails %}{% for post in posts %}'
+            '{% post_picture post.image as picture %}'
+            '{{ picture.fallback.url }}|{{ picture.srcset }}\n'
+            '{% endfor %}')
+        context = Context({'posts': posts, 'thumbnails': thumbnails_map})
+        with self.assertNumQueries(0):
+            lines = template.render(context).splitlines()
+        for post, line in zip(posts, lines):
+            fallback, srcset = line.split('|')
+            self.assertEqual(fallback, thumbnails_map[
+                post.image.name, thumbnails.FALLBACK.key].url)
+            webp = thumbnails.SRCSET[0]
+            self.assertEqual(srcset, '{} {}w'.format(
+                thumbnails_map[post.image.name, webp.key].url, webp.width))
+            self.assertTrue(fallback.startswith(settings.MEDIA_URL))
+
+    def test_feed_uses_prefetched_thumbnails(self):
+        """Лента передаёт в шаблон миниатюры всех постов страницы."""
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn((post.image.name, thumbnails.FALLBACK.key),
+                      response.context['thumbnails'])
+        self.assertContains(response, '<source type="image/webp"')
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    @mock.patch('posts.thumbnails.schedule')
+    def test_missing_thumbnails_not_generated_in_request(self, schedule):
+        """Пока миниатюр нет, страница показывает оригинал, а картинка
+        один раз заказывается в пул; в запросе миниатюры не создаются."""
+        post = self.create_post()
+        schedule.reset_mock()
+        cache.clear()
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            response = self.client.get(reverse('posts:index'))
+            self.assertEqual(thumbnails.prefetch([post]), {})
+        get_image.assert_not_called()
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertNotContains(response, '<source type="image/webp"')
+        schedule.assert_called_once_with(post.image.name, 2)
+
+    def test_card_shows_thumbnails_once_ready(self):
+        """Карточка с оригиналом вместо миниатюр не остаётся в кэше после
+        их генерации."""
+        post = self.create_post()
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.assertNotContains(self.client.get(url),
+                               '<source type="image/webp"')
+        thumbnails.generate(post.image.name)
+        self.assertContains(self.client.get(url),
+                            '<source type="image/webp"')
+
+    def test_animated_gif_becomes_animated_webp(self):
+        """Анимация GIF сохраняется в WebP-вариантах, а каждый вариант
+        получает свою ширину."""
+        frames = [Image.new('RGB', (1200, 800), color)
+                  for color in ('red', 'green', 'blue')]
+        content = BytesIO()
+        frames[0].save(content, 'GIF', save_all=True,
+                       append_images=frames[1:], duration=100, loop=0)
+        post = Post.objects.create(
+            author=self.user,
+            text='Анимация',
+            image=SimpleUploadedFile('animated.gif', content.getvalue(),
+                                     'image/gif'),
+        )
+        thumbnails.generate(post.image.name)
+        pictures = thumbnails.prefetch([post])
+        for variant in thumbnails.SRCSET:
+            with self.subTest(variant=variant.key):
+                thumbnail = pictures[post.image.name, variant.key]
+                with Image.open(BytesIO(thumbnail.read())) as image:
+                    self.assertEqual(image.format, 'WEBP')
+                    self.assertEqual(image.n_frames, 3)
+                    self.assertEqual(image.width, variant.width)
@@ -0,0 +1,11 @@
+from io import BytesIO
+
+from PIL import Image
+
+
+def small_gif(comment):
+    """GIF 2x1 с комментарием: хранилище по хешу содержимого не сливает
+    картинки с разными комментариями в один файл."""
+    content = BytesIO()
+    Image.new('P', (2, 1)).save(content, 'GIF', comment=comment.encode())
+    return content.getvalue()
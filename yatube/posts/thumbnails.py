@@ -0,0 +1,234 @@
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from PIL import ImageSequence
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.engines import pil_engine
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.queries import unbudgeted
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+Variant = namedtuple('Variant', 'key geometry options width')
+
+# Картинка поста показывается полосой 960x339. Браузеру предлагаются WebP
+# нескольких ширин, а JPEG 960 px остаётся для браузеров без WebP.
+ASPECT_RATIO = 960 / 339
+SRCSET_WIDTHS = (480, 720, 960)
+WEBP_QUALITY = 80
+
+
+def geometry(width):
+    return f'{width}x{round(width / ASPECT_RATIO)}'
+
+
+FALLBACK = Variant(
+    'jpeg', geometry(960), {'crop': 'center', 'upscale': True}, 960)
+SRCSET = tuple(
+    Variant(f'webp-{width}', geometry(width), {
+        'crop': 'center', 'upscale': True,
+        'format': 'WEBP', 'quality': WEBP_QUALITY,
+    }, width)
+    for width in SRCSET_WIDTHS
+)
+VARIANTS = (FALLBACK, *SRCSET)
+
+
+def image_variants(width):
+    """Варианты картинки шириной width: JPEG и WebP не шире оригинала,
+    чтобы не хранить и не отдавать растянутые копии."""
+    srcset = [variant for variant in SRCSET
+              if width is None or variant.width <= width]
+    return (FALLBACK, *(srcset or SRCSET[:1]))
+
+
+GENERATED, MISSING, FAILED = 'generated', 'missing', 'failed'
+# Картинку без миниатюр показывают все запросы подряд, а в пул она
+# заказывается не чаще раза в SCHEDULED_TIMEOUT секунд.
+SCHEDULED_TIMEOUT = 60 * 5
+
+executor = None
+
+
+class Engine(pil_engine.Engine):
+    """Движок sorl, сохраняющий анимацию: для WebP обрабатывается каждый
+    кадр исходной картинки, а не только первый."""
+
+    def create(self, image, geometry, options):
+        if options['format'] != 'WEBP' or not getattr(
+                image, 'is_animated', False):
+            return super().create(image, geometry, options)
+        frames, durations = [], []
+        for frame in ImageSequence.Iterator(image):
+            durations.append(frame.info.get('duration', 100))
+            frames.append(super().create(frame.copy(), geometry, options))
+        first = frames[0]
+        first.animation = (frames[1:], durations, image.info.get('loop', 0))
+        return first
+
+    def _get_raw_data(self, image, format_, quality, image_info=None,
+                      progressive=False):
+        animation = getattr(image, 'animation', None)
+        if animation is None:
+            return super()._get_raw_data(
+                image, format_, quality, image_info, progressive)
+        frames, durations, loop = animation
+        with BytesIO() as buffer:
+            image.save(buffer, format_, quality=quality, save_all=True,
+                       append_images=frames, duration=durations, loop=loop)
+            return buffer.getvalue()
+
+
+class KVStore(CachedDBKVStore):
+    """KVStore sorl, читающий много записей за раз."""
+
+    def get_many(self, image_files):
+        """Возвращает {ключ: ImageFile} найденных записей: одно чтение
+        кэша и один запрос к базе для ключей, которых нет в кэше."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fetched)
+        return {
+            keys[key]: deserialize_image_file(value)
+            for key, value in values.items() if value != EMPTY_VALUE
+        }
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    """Бэкенд sorl, находящий готовые миниатюры многих картинок одним
+    чтением KVStore."""
+
+    def thumbnail_file(self, source, geometry_string, options):
+        """Файл миниатюры, который создал бы get_thumbnail, — без
+        обращения к KVStore и хранилищу."""
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_thumbnails(self, images):
+        """Миниатюры картинок по парам (файл, варианты):
+        {(имя картинки, ключ варианта): миниатюра}.
+
+        Миниатюр, которых нет в KVStore, в карте нет: в запросе они
+        не создаются, а картинка заказывается в пул (schedule_missing).
+        """
+        wanted = {}
+        for file_, variants in images:
+            source = ImageFile(file_)
+            for variant in variants:
+                wanted[file_.name, variant.key] = (file_, variant, (
+                    self.thumbnail_file(
+                        source, variant.geometry, variant.options)))
+        found = default.kvstore.get_many(
+            thumbnail for _, _, thumbnail in wanted.values())
+        result, missing = {}, {}
+        for key, (file_, _, thumbnail) in wanted.items():
+            if thumbnail.key in found:
+                result[key] = found[thumbnail.key]
+            else:
+                missing[file_.name] = file_.instance.image_width
+        for name, width in missing.items():
+            schedule_missing(name, width)
+        return result
+
+
+def prefetch(posts):
+    """Миниатюры картинок постов страницы для тега post_picture."""
+    images = [(post.image, image_variants(post.image_width))
+              for post in posts if post.image]
+    if not images:
+        return {}
+    return default.backend.get_thumbnails(images)
+
+
+def generate(name, width=None):
+    """Создаёт миниатюры картинки шириной width во всех её вариантах.
+
+    Возвращает GENERATED, MISSING, если файла нет в хранилище, или FAILED,
+    если картинку не удалось обработать. Уже созданные миниатюры sorl
+    находит в KVStore или в хранилище и не пересчитывает, так что повторный
+    вызов ничего не меняет.
+    """
+    try:
+        if not image_storage.exists(name):
+            return MISSING
+        source = ImageFile(name, image_storage)
+        for variant in image_variants(width):
+            get_thumbnail(source, variant.geometry, **variant.options)
+        return GENERATED
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        return FAILED
+
+
+def generate_in_thread(name, width):
+    try:
+        return generate(name, width)
+    finally:
+        # Соединения потока пула не закрываются Django сами.
+        connections.close_all()
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return executor
+
+
+def schedule(name, width=None):
+    """Создаёт миниатюры после фиксации транзакции в пуле потоков, вне
+    обработки запроса; при THUMBNAIL_WORKERS = 0 — сразу после фиксации,
+    не расходуя бюджет запросов вью."""
+    def submit():
+        if settings.THUMBNAIL_WORKERS:
+            get_executor().submit(generate_in_thread, name, width)
+        else:
+            with unbudgeted():
+                generate(name, width)
+
+    transaction.on_commit(submit)
+
+
+def schedule_missing(name, width=None):
+    """Заказывает миниатюры, которых не нашлось при показе картинки.
+
+    При THUMBNAIL_WORKERS = 0 пула нет, и запрос их не создаёт: миниатюры
+    новых постов создаются после сохранения, а недостающие — командой
+    generate_thumbnails.
+    """
+    if settings.THUMBNAIL_WORKERS and cache.add(
+            f'thumbnails-scheduled:{name}', True, SCHEDULED_TIMEOUT):
+        schedule(name, width)
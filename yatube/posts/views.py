@@ -1,93 +1,179 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.http import urlencode
 
+from core.cache import versioned_page
+from core.queries import query_budget
+from .autocomplete import index as autocomplete_index
+from .feeds import follow_paginator
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
+from .models import AuthorStats, Post, Group, User, Follow
+from .paginator import FeedPaginator, cursor_batch, decode_cursor
+from .scopes import post_page_scopes, remember_post
+from .search import SearchPaginator, SearchResults
+from .thumbnails import prefetch as prefetch_thumbnails
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
 
 
+def paginate(request, post_list, key, paginator_class=FeedPaginator):
+    paginator = paginator_class(post_list, POSTS_PER_PAGE, key)
+    page_number = request.GET.get('page')
+    return paginator.get_page(page_number)
+
+
+def with_following(queryset, user, author='pk'):
+    """Добавляет флаг is_following — подписан ли user на автора, —
+    вычисляемый в том же запросе."""
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(is_following=Exists(
+        Follow.objects.filter(user=user, author=OuterRef(author))
+    ))
+
+
+def comments_batch(post, after=None):
+    comments = post.comments.select_related('author')
+    return cursor_batch(comments, COMMENTS_PER_PAGE, after)
+
+
+@query_budget(6)
+@versioned_page('index')
 def index(request):
     post_list = Post.objects.select_related('author', 'group')
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, post_list, 'index')
     context = {
         'page_obj': page_obj,
+        'thumbnails': prefetch_thumbnails(page_obj),
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(7)
+@versioned_page('group:{slug}')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = paginate(request, post_list, f'group:{group.pk}')
     context = {
         'group': group,
         'page_obj': page_obj,
+        'thumbnails': prefetch_thumbnails(page_obj),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(7)
+@versioned_page('profile:{username}')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
     user = request.user
-    following = user.is_authenticated
-    if following:
-        following = author.following.filter(user=user).exists()
+    author = get_object_or_404(
+        with_following(User.objects.select_related('stats'), user),
+        username=username,
+    )
+    posts = author.posts.select_related('author', 'group')
+    page_obj = paginate(request, posts, f'profile:{author.pk}')
 
     context = {
         'page_obj': page_obj,
+        'thumbnails': prefetch_thumbnails(page_obj),
         'author': author,
-        'following': following,
+        'stats': AuthorStats.for_user(author),
+        'following': getattr(author, 'is_following', False),
         'user': user
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(4)
+@versioned_page('post:{post_id}', post_page_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    posts = with_following(
+        Post.objects.select_related('author__stats', 'group'),
+        request.user,
+        'author',
+    )
+    post = get_object_or_404(posts, pk=post_id)
+    remember_post(post)
     author = post.author
-    posts_count = author.posts.count()
+    posts_count = AuthorStats.for_user(author).posts_count
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
-
-    user = request.user
-    following = user.is_authenticated
-    if following:
-        following = author.following.filter(user=user).exists()
+    comments, next_cursor = comments_batch(post)
 
     context = {
         'post': post,
+        'thumbnails': prefetch_thumbnails([post]),
         'posts_count': posts_count,
         'comments': comments,
+        'next_cursor': next_cursor,
         'form': form,
         'author': author,
-        'following': following,
+        'following': getattr(post, 'is_following', False),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(4)
+@versioned_page('post:{post_id}')
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    after = decode_cursor(request.GET.get('after', ''))
+    if after is None:
+        raise Http404('Неверный курсор комментариев')
+    comments, next_cursor = comments_batch(post, after)
+    context = {
+        'post': post,
+        'comments': comments,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@query_budget(6)
+@versioned_page('index')
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(SearchResults(query), POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'thumbnails': prefetch_thumbnails(page_obj),
+        'page_params': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+# Подсказки отдаются из памяти процесса: запросы к базе бывают только
+# при построении индекса, а к сессии вью не обращается.
+@query_budget(2)
+def autocomplete(request):
+    entries = autocomplete_index.search(request.GET.get('q', ''))
+    return JsonResponse({'results': [
+        {'type': entry.kind, 'label': entry.label, 'url': entry.url}
+        for entry in entries
+    ]})
+
+
+@query_budget(13)
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        form.save(commit=True)
+        with transaction.atomic():
+            form.save(commit=True)
         return redirect('posts:profile', username=request.user)
 
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@query_budget(10)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -107,6 +193,7 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(7)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -115,20 +202,20 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(7)
 @login_required
 def follow_index(request):
-    user = request.user
-    posts = Post.objects.select_related('author', 'group').filter(
-        author__following__user=user)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
+    paginator = follow_paginator(request.user, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     context = {
         'page_obj': page_obj,
+        'thumbnails': prefetch_thumbnails(page_obj),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -139,7 +226,7 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if user != author:
         Follow.objects.get_or_create(user=user, author=author)
-    return profile(request, username)
+    return profile(request, username=username)
 
 
 @login_required
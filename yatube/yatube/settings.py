@@ -1,4 +1,5 @@
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -6,6 +7,8 @@ SECRET_KEY = os.getenv(key='SECRET_KEY', default='keep_the_secret')
 
 DEBUG = True
 
+TESTING = 'test' in sys.argv[1:2] or 'pytest' in sys.modules
+
 ALLOWED_HOSTS = ['178.154.195.215', '127.0.0.1', 'localhost']
 
 SHELL_PLUS = "ipython"
@@ -26,6 +29,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.static.StaticFilesMiddleware',
+    'core.queries.SlowQueryMiddleware',
+    'core.queries.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -112,6 +118,11 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# collectstatic собирает статику с хешами в именах и сжатыми копиями,
+# которые без DEBUG отдаёт core.static.StaticFilesMiddleware.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'core.static.CompressedManifestStaticFilesStorage'
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -126,30 +137,87 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Отдачу медиа можно передать фронтовому серверу: 'x-accel-redirect' для
+# nginx (внутренний location MEDIA_ACCEL_PREFIX с alias на MEDIA_ROOT) или
+# 'x-sendfile' для Apache; пусто — файлы отдаёт core.media.serve.
+MEDIA_OFFLOAD = os.getenv('MEDIA_OFFLOAD', default='')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX',
+                               default='/protected-media/')
+
+# Лента подписок: 'push' — записи раскладываются по лентам подписчиков при
+# публикации, 'pull' — лента собирается при чтении слиянием лент авторов.
+FOLLOW_FEED_STRATEGY = 'push'
+
+# Время жизни кэша страниц для анонимных посетителей, 0 — кэш выключен.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', default=0))
+
+# Превышение бюджета запросов вью и N+1: False — предупреждение в лог,
+# True — исключение. В тестах бюджеты проверяются всегда.
+QUERY_BUDGET_STRICT = TESTING
+
+# Запросы дольше порога (в миллисекундах) пишутся в лог core.queries.slow
+# с планом запроса; проверяется доля запросов к сайту SLOW_QUERY_SAMPLE_RATE.
+SLOW_QUERY_THRESHOLD_MS = float(
+    os.getenv('SLOW_QUERY_THRESHOLD_MS', default=100))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_SAMPLE_RATE', default=1))
+
+# Число потоков, создающих миниатюры картинок новых постов вне запроса;
+# 0 — миниатюры создаются сразу после фиксации транзакции. В тестах потоков
+# нет: они писали бы во временный MEDIA_ROOT, пока тест его удаляет.
+THUMBNAIL_WORKERS = 0 if TESTING else int(
+    os.getenv('THUMBNAIL_WORKERS', default=2))
+
+# Бэкенд и KVStore sorl с пакетным чтением готовых миниатюр страницы
+# движок, сохраняющий анимацию GIF в WebP, и хранилище, заменяющее
+# миниатюру с тем же именем, а не создающее копию с суффиксом.
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+THUMBNAIL_ENGINE = 'posts.thumbnails.Engine'
+THUMBNAIL_STORAGE = 'posts.storage.ThumbnailStorage'
+
+# Версии страниц (core.cache), счётчики лент и индексы пагинации хранятся
+# в кэше и должны быть общими для всех процессов сайта. LocMemCache у каждого
+# процесса свой: bump() в одном воркере не сбросит страницы и ETag в других,
+# и они до VERSION_TIMEOUT отдают старое. Поэтому LocMemCache годится только
+# для разработки и тестов в одном процессе, а на сервере с несколькими
+# воркерами в .env задаётся общий кэш, например
+# CACHE_BACKEND = 'django.core.cache.backends.memcached.MemcachedCache'
+# и CACHE_LOCATION = '127.0.0.1:11211'.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
     }
 }
 
 LOGGING = {
     'version': 1,
-    'filters': {
-        'require_debug_true': {
-            '()': 'django.utils.log.RequireDebugTrue',
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {
+            'format': '%(message)s',
         }
     },
     'handlers': {
         'console': {
-            'level': 'DEBUG',
-            'filters': ['require_debug_true'],
             'class': 'logging.StreamHandler',
+        },
+        'json': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
         }
     },
     'loggers': {
-        'django.db.backends': {
-            'level': 'DEBUG',
+        'core.queries': {
+            'level': 'WARNING',
             'handlers': ['console'],
+        },
+        'core.queries.slow': {
+            'level': 'INFO',
+            'handlers': ['json'],
+            'propagate': False,
         }
     }
 }